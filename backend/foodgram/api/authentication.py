@@ -0,0 +1,89 @@
+from hashlib import sha256
+
+from api.metrics import record_cache
+from api.replicas import use_primary
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from recipes.versions import is_shared_cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+User = get_user_model()
+
+AUTH_TOKEN_CACHE = 'auth_token'
+
+
+def token_cache_key(key):
+    '''Сам токен в ключ кэша не попадает.'''
+
+    return f'{AUTH_TOKEN_CACHE}:{sha256(key.encode()).hexdigest()}'
+
+
+def forget_tokens(keys):
+    '''Удаляет закэшированные токены после фиксации транзакции, чтобы
+    параллельный запрос не успел закэшировать их заново из старых данных.
+    '''
+
+    cache_keys = [token_cache_key(key) for key in keys]
+    transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
+def forget_user_tokens(user_ids):
+    '''Сбрасывает закэшированные токены польз-лей user_ids.
+
+    Нужна после изменения польз-лей в обход save(), например
+    User.objects.filter(...).update(is_active=False): сигналы при этом
+    не отправляются, и без нее закэшированный is_active остался бы
+    до AUTH_TOKEN_CACHE_TIMEOUT.
+    '''
+
+    forget_tokens(
+        Token.objects.filter(user_id__in=user_ids)
+        .values_list('key', flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''TokenAuthentication, который хранит id и is_active польз-ля токена
+    в кэше AUTH_TOKEN_CACHE_TIMEOUT секунд вместо запроса к БД на каждый
+    запрос. Польз-ль запроса создается с отложенными полями: остальные
+    поля загружаются одним запросом при первом обращении, а пароль в
+    кэш не попадает. Записи удаляются сигналами api.signals при
+    удалении токена и сохранении польз-ля, а после QuerySet.update()
+    польз-лей - вызовом forget_user_tokens.
+
+    Удаление записи должны видеть все процессы, поэтому с кэшем, видным
+    только текущему, токен каждый раз читается из БД.
+
+    Промах читает с основной БД: токен, только что выданный при входе,
+    может еще не дойти до реплики, а удаленный - остаться на ней.
+    '''
+
+    def authenticate_credentials(self, key):
+        if not is_shared_cache():
+            with use_primary():
+                return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        credentials = cache.get(cache_key)
+        record_cache(AUTH_TOKEN_CACHE, credentials is not None)
+        if credentials is None:
+            with use_primary():
+                user, token = super().authenticate_credentials(key)
+            cache.set(
+                cache_key, (user.pk, user.is_active),
+                settings.AUTH_TOKEN_CACHE_TIMEOUT
+            )
+            return user, token
+        user_id, is_active = credentials
+        if not is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        user = User.from_db(
+            DEFAULT_DB_ALIAS, ['id', 'is_active'], [user_id, is_active]
+        )
+        token = Token.from_db(
+            DEFAULT_DB_ALIAS, ['key', 'user_id'], [key, user_id]
+        )
+        return user, token
@@ -0,0 +1,107 @@
+import binascii
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from api.metrics import IMAGE_UPLOAD_BYTES, store
+from django.conf import settings
+from django.core.files import File
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+
+BASE64_MARKER = ';base64,'
+CHUNK_SIZE = 64 * 1024
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+
+class Base64ImageField(serializers.ImageField):
+    '''Картинка в виде data URI с base64.
+
+    Строка декодируется по частям во временный файл, который остается
+    в памяти только пока он небольшой. Размер строки проверяется до
+    декодирования, размеры картинки - по заголовку, до распаковки пикселей.
+    '''
+
+    default_error_messages = {
+        'too_large': 'Размер картинки превышает {max_size} байт.',
+        'too_many_pixels': (
+            'Размер картинки {width}x{height} превышает допустимый '
+            '{max_dimension}x{max_dimension} или {max_pixels} пикселей.'
+        ),
+        'invalid_base64': 'Картинка должна быть закодирована в base64.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith('http'):
+            raise SkipField()
+        if not (isinstance(data, str) and data.startswith('data:')):
+            return super().to_internal_value(data)
+
+        start = data.find(BASE64_MARKER)
+        if start == -1:
+            self.fail('invalid_base64')
+        start += len(BASE64_MARKER)
+        max_size = settings.RECIPE_IMAGE_MAX_ENCODED_BYTES
+        if len(data) - start > max_size:
+            self.fail('too_large', max_size=max_size)
+
+        file = self.decode(data, start)
+        try:
+            image = Image.open(file)
+            self.check_dimensions(*image.size)
+            image.verify()
+        except (UnidentifiedImageError, SyntaxError, OSError,
+                Image.DecompressionBombError):
+            file.close()
+            self.fail('invalid_image')
+        except serializers.ValidationError:
+            file.close()
+            raise
+        if image.format not in IMAGE_FORMATS:
+            file.close()
+            self.fail('invalid_image')
+
+        file.seek(0, 2)
+        store.observe(IMAGE_UPLOAD_BYTES, file.tell(), format=image.format)
+        file.seek(0)
+        return File(
+            file, name=f'{uuid.uuid4()}.{IMAGE_FORMATS[image.format]}'
+        )
+
+    def decode(self, data, start):
+        '''Декодирует base64 начиная с позиции start порциями по
+        CHUNK_SIZE символов, не создавая копии всей строки.
+        '''
+
+        file = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        tail = ''
+        try:
+            for position in range(start, len(data), CHUNK_SIZE):
+                chunk = tail + ''.join(
+                    data[position:position + CHUNK_SIZE].split()
+                )
+                usable = len(chunk) - len(chunk) % 4
+                file.write(binascii.a2b_base64(chunk[:usable]))
+                tail = chunk[usable:]
+            if tail:
+                raise binascii.Error('Incorrect padding')
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_base64')
+        file.seek(0)
+        return file
+
+    def check_dimensions(self, width, height):
+        max_dimension = settings.RECIPE_IMAGE_MAX_DIMENSION
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        if (width > max_dimension or height > max_dimension
+                or width * height > max_pixels):
+            self.fail(
+                'too_many_pixels',
+                width=width,
+                height=height,
+                max_dimension=max_dimension,
+                max_pixels=max_pixels
+            )
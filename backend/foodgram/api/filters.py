@@ -1,23 +1,37 @@
 import django_filters
-from recipes.models import Ingredient, Recipe, Tag
-from rest_framework.filters import SearchFilter
+from api.search import ingredient_index, search_recipes
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from rest_framework.filters import BaseFilterBackend
 
 
-class SearchIngredient(SearchFilter):
+class SearchIngredient(BaseFilterBackend):
+    '''Поиск ингредиентов по названию через индекс в памяти процесса.'''
+
     search_param = 'name'
 
-    class Meta:
-        model = Ingredient
-        fields = ('name', )
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name or view.action != 'list':
+            return queryset
+        return ingredient_index.search(
+            name, settings.INGREDIENT_SEARCH_LIMIT
+        )
 
 
 class RecipeFilter(django_filters.FilterSet):
-    '''Фильтрация по вложенным полям в модели Recipe.'''
+    '''Фильтрация по вложенным полям в модели Recipe.
+
+    Связанные таблицы проверяются подзапросами EXISTS, а не JOIN,
+    поэтому рецепты не дублируются и DISTINCT не нужен.
+    '''
 
     tags = django_filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        method='filter_tags'
     )
     is_favorited = django_filters.NumberFilter(
         method='filter_is_favorited',
@@ -25,19 +39,36 @@ class RecipeFilter(django_filters.FilterSet):
     is_in_shopping_cart = django_filters.NumberFilter(
         method='filter_is_in_shopping_cart',
     )
+    search = django_filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart', )
 
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag__in=value
+            )
+        ))
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(favorites__user=self.request.user)
+            return queryset.filter(Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(shopping_carts__user=self.request.user)
+            return queryset.filter(Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ))
         return queryset
@@ -0,0 +1,193 @@
+import json
+import logging
+import random
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from api.metrics import record_request
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDERS = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+SPACES = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    '''Запрос без значений: одинаковые по форме запросы с разными
+    параметрами и длиной списков IN сводятся к одной строке.
+    '''
+
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = PLACEHOLDERS.sub('(...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+class RequestMetrics:
+    '''Число и время SQL-запросов, время вьюхи и сериализации
+    одного запроса.
+    '''
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.statements = {}
+        self.timings = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        '''Обертка для connection.execute_wrapper.'''
+
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_count += 1
+            self.sql_time += elapsed
+            count, total = self.statements.get(sql, (0, 0.0))
+            self.statements[sql] = (count + 1, total + elapsed)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = (
+                self.timings.get(name, 0.0) + time.perf_counter() - started
+            )
+
+    def worst_statements(self, limit):
+        '''Самые долгие по суммарному времени нормализованные запросы.'''
+
+        grouped = {}
+        for sql, (count, total) in self.statements.items():
+            normalized = normalize_sql(sql)
+            old_count, old_total = grouped.get(normalized, (0, 0.0))
+            grouped[normalized] = (old_count + count, old_total + total)
+        worst = sorted(grouped.items(), key=lambda item: -item[1][1])
+        return [
+            {'sql': sql, 'count': count, 'ms': round(total * 1000, 2)}
+            for sql, (count, total) in worst[:limit]
+        ]
+
+    def server_timing(self):
+        entries = [
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} SQL"'
+        ]
+        entries += [
+            f'{name};dur={elapsed * 1000:.1f}'
+            for name, elapsed in self.timings.items()
+        ]
+        return ', '.join(entries)
+
+
+def get_metrics(request):
+    '''Метрики запроса, если он попал в выборку, иначе None.'''
+
+    return getattr(request, 'metrics', None)
+
+
+class RequestTimingMiddleware:
+    '''Считает SQL-запросы и время ответа для доли запросов
+    REQUEST_TIMING_SAMPLE_RATE, добавляет заголовок Server-Timing
+    и пишет в лог запросы медленнее SLOW_REQUEST_MS или с числом
+    SQL-запросов больше SLOW_REQUEST_QUERIES.
+
+    Число и время всех запросов, а число SQL-запросов для попавших
+    в выборку, попадают в метрики эндпоинта /api/metrics.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            started = time.perf_counter()
+            response = self.get_response(request)
+            record_request(request, response, time.perf_counter() - started)
+            return response
+
+        metrics = request.metrics = RequestMetrics()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            with metrics.timer('total'):
+                response = self.get_response(request)
+        response['Server-Timing'] = metrics.server_timing()
+        record_request(
+            request, response, metrics.timings['total'], metrics.sql_count
+        )
+        self.log_slow_request(request, response, metrics)
+        return response
+
+    def log_slow_request(self, request, response, metrics):
+        total_ms = metrics.timings['total'] * 1000
+        if (
+            total_ms < settings.SLOW_REQUEST_MS
+            and metrics.sql_count <= settings.SLOW_REQUEST_QUERIES
+        ):
+            return
+        report = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'sql_count': metrics.sql_count,
+            'timings_ms': {
+                'db': round(metrics.sql_time * 1000, 2),
+                **{
+                    name: round(elapsed * 1000, 2)
+                    for name, elapsed in metrics.timings.items()
+                },
+            },
+            'worst_sql': metrics.worst_statements(
+                settings.SLOW_REQUEST_TOP_STATEMENTS
+            ),
+        }
+        logger.warning(
+            'Медленный запрос %s %s: %s', request.method, request.path,
+            json.dumps(report, ensure_ascii=False),
+            extra={'request_metrics': report}
+        )
+
+
+class InstrumentedViewMixin:
+    '''Разделяет время вьюхи DRF и сериализации для запросов,
+    попавших в выборку RequestTimingMiddleware, и подписывает запрос
+    именем вьюсета и действия для метрик, например recipe.list.
+    '''
+
+    def dispatch(self, request, *args, **kwargs):
+        metrics = get_metrics(request)
+        try:
+            if metrics is None:
+                return super().dispatch(request, *args, **kwargs)
+            with metrics.timer('view'):
+                return super().dispatch(request, *args, **kwargs)
+        finally:
+            request.handler_name = f'{self.basename}.{self.action}'
+
+    def get_serializer(self, *args, **kwargs):
+        return self.instrument(super().get_serializer(*args, **kwargs))
+
+    def instrument(self, serializer):
+        '''Засекает время to_representation сериализатора верхнего
+        уровня, вложенные сериализаторы входят в него.
+        '''
+
+        metrics = get_metrics(self.request)
+        if metrics is None:
+            return serializer
+        to_representation = serializer.to_representation
+
+        def timed_to_representation(instance):
+            with metrics.timer('serialize'):
+                return to_representation(instance)
+
+        serializer.to_representation = timed_to_representation
+        return serializer
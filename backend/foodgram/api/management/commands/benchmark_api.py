@@ -0,0 +1,238 @@
+import json
+import statistics
+import sys
+import tempfile
+import time
+
+import django
+from api import pdf
+from api.urls import router
+from api.views import RecipeViewSet
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+
+User = get_user_model()
+
+# Дополнительные варианты запросов к спискам, которые нагружают
+# фильтры, поиск и пагинацию.
+QUERY_VARIANTS = {
+    'recipe-list': (
+        'page=2', 'tags={tag}', 'search=суп', 'is_favorited=1',
+        'is_in_shopping_cart=1', 'cursor=', 'author={id}',
+    ),
+    'ingredient-list': ('name=сол', ),
+    'user-subscriptions': ('recipes_limit=3', ),
+    'recipe-download-shopping-cart': ('format=csv', 'format=json'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа и число SQL-запросов для каждого маршрута '
+        'API через тестовый клиент и выводит отчет в JSON. Перед '
+        'каждым холодным замером кэш очищается, поэтому не запускайте '
+        'команду с кэшем продакшена'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--user', type=int,
+            help='id польз-ля для авторизованных запросов, по умолчанию '
+                 'самый активный автор'
+        )
+        parser.add_argument(
+            '--output', help='Файл для отчета, по умолчанию stdout'
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        self.samples = self.get_samples(user)
+        self.options = options
+        clients = {'anonymous': Client(), 'user': Client()}
+        token, _ = Token.objects.get_or_create(user=user)
+        clients['user'].defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+
+        # PDF рендерится заглушкой сразу в запросе во временный каталог:
+        # замер не зависит от wkhtmltopdf и не оставляет файлов.
+        with tempfile.TemporaryDirectory() as pdf_root, override_settings(
+            SHOPPING_LIST_PDF_RENDERER='api.pdf.stub_renderer',
+            SHOPPING_LIST_PDF_WORKERS=0,
+            SHOPPING_LIST_PDF_ROOT=pdf_root,
+        ):
+            self.samples['job_id'], _ = pdf.submit(
+                user.pk, list(RecipeViewSet().get_shopping_list(user))
+            )
+            results = [
+                self.measure(clients[client], client, method, url, setup)
+                for method, url, setup in self.get_requests()
+                for client in clients
+            ]
+        report = {
+            'meta': self.get_meta(user, options),
+            'results': results,
+        }
+        content = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(content + '\n')
+        else:
+            self.stdout.write(content)
+
+    def get_user(self, user_id):
+        if user_id:
+            return User.objects.get(pk=user_id)
+        user = User.objects.order_by('-recipes_count', 'pk').first()
+        if user is None:
+            raise CommandError('В БД нет польз-лей, выполните '
+                               'generate_fake_data.')
+        return user
+
+    def get_samples(self, user):
+        recipe = Recipe.objects.filter(author=user).first()
+        if recipe is None:
+            recipe = Recipe.objects.first()
+        author = (
+            User.objects.exclude(pk=user.pk)
+            .annotate(total=Count('recipes'))
+            .order_by('-total').first()
+        )
+        if recipe is None or author is None:
+            raise CommandError('Недостаточно данных, выполните '
+                               'generate_fake_data.')
+        tag = Tag.objects.first()
+        return {
+            'pk': recipe.pk,
+            'id': author.pk,
+            'tag': tag.slug if tag else '',
+        }
+
+    def get_kwargs(self, viewset, detail):
+        if not detail:
+            return {}
+        model = viewset.queryset.model
+        if model is Recipe:
+            value = self.samples['pk']
+        elif model is User:
+            value = self.samples['id']
+        else:
+            value = model.objects.values_list('pk', flat=True).first()
+        return {viewset.lookup_url_kwarg or viewset.lookup_field: value}
+
+    def get_requests(self):
+        '''Все маршруты роутера api: списки, детали и действия,
+        и выход по токену, в виде (метод, url, подготовка).
+
+        Изменяющие запросы выполняются в откатываемой транзакции.
+        Перед DELETE действия, у которого есть и POST, выполняется POST,
+        чтобы замерять удаление, а не ответ 404.
+        '''
+
+        for _, viewset, basename in router.registry:
+            routes = [('list', False, ('get', )), ('detail', True, ('get', ))]
+            routes += [
+                (action.url_name, action.detail,
+                 tuple(method for method in action.mapping))
+                for action in viewset.get_extra_actions()
+            ]
+            for url_name, detail, methods in routes:
+                name = f'{basename}-{url_name}'
+                kwargs = self.get_kwargs(viewset, detail)
+                if name.endswith('-job'):
+                    kwargs = {'job_id': self.samples['job_id']}
+                url = reverse(name, kwargs=kwargs)
+                for method in methods:
+                    setup = 'post' if (
+                        method == 'delete' and 'post' in methods
+                    ) else None
+                    yield method, url, setup
+                for query in QUERY_VARIANTS.get(name, ()):
+                    yield 'get', f'{url}?{query.format(**self.samples)}', None
+        yield 'post', reverse('logout'), None
+
+    def measure(self, client, client_name, method, url, setup):
+        '''Каждая попытка - холодный запрос после очистки кэша и сразу
+        за ним теплый, они выводятся отдельно.
+        '''
+
+        timings = {'cold': [], 'warm': []}
+        queries = {}
+        status = None
+        for attempt in range(self.options['warmup'] + self.options['repeat']):
+            for name in timings:
+                elapsed, queries[name], status = self.request(
+                    client, method, url, setup, cold=name == 'cold'
+                )
+                if attempt >= self.options['warmup']:
+                    timings[name].append(elapsed * 1000)
+        return {
+            'method': method.upper(),
+            'url': url,
+            'client': client_name,
+            'status': status,
+            **{
+                name: self.summarize(timings[name], queries[name])
+                for name in timings
+            },
+        }
+
+    def summarize(self, timings, queries):
+        timings = sorted(timings)
+        return {
+            'queries': queries,
+            'min_ms': round(timings[0], 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+            'max_ms': round(timings[-1], 2),
+        }
+
+    def request(self, client, method, url, setup, cold=False):
+        '''Время ответа, число запросов к БД и статус ответа.
+
+        Потоковые ответы читаются целиком внутри замера: их запросы
+        к БД выполняются при чтении тела.
+        '''
+
+        with transaction.atomic():
+            try:
+                if setup:
+                    getattr(client, setup)(url)
+                if cold:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(url)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - started
+                return (
+                    elapsed, len(context.captured_queries),
+                    response.status_code
+                )
+            finally:
+                transaction.set_rollback(True)
+
+    def get_meta(self, user, options):
+        return {
+            'created': timezone.now().isoformat(),
+            'python': sys.version.split()[0],
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'user': user.pk,
+            'repeat': options['repeat'],
+            'rows': {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+            },
+        }
@@ -0,0 +1,15 @@
+from api.mixins import response_cache_stats
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша ответов для анонимов'
+
+    def handle(self, *args, **options):
+        stats = response_cache_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            f'доля попаданий: {ratio:.1%}'
+        )
@@ -0,0 +1,357 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+IMAGE_BUCKETS = tuple(
+    size * 1024 for size in (64, 256, 512, 1024, 2048, 5120, 10240)
+)
+
+REQUESTS = 'foodgram_http_requests_total'
+REQUEST_DURATION = 'foodgram_http_request_duration_seconds'
+REQUEST_QUERIES = 'foodgram_http_request_db_queries'
+CACHE_REQUESTS = 'foodgram_cache_requests_total'
+CACHE_HIT_RATIO = 'foodgram_cache_hit_ratio'
+IMAGE_UPLOAD_BYTES = 'foodgram_image_upload_bytes'
+PROCESSES = 'foodgram_metrics_processes'
+
+HELP = {
+    REQUESTS: 'Число запросов по обработчику, методу и статусу.',
+    REQUEST_DURATION: 'Время ответа по обработчику.',
+    REQUEST_QUERIES: 'Число SQL-запросов на запрос (по выборке '
+                     'REQUEST_TIMING_SAMPLE_RATE).',
+    CACHE_REQUESTS: 'Обращения к кэшам ответов по результату.',
+    CACHE_HIT_RATIO: 'Доля попаданий в кэш.',
+    IMAGE_UPLOAD_BYTES: 'Размер загруженных картинок рецептов.',
+    PROCESSES: 'Число работающих процессов с файлами метрик.',
+}
+BUCKETS = {
+    REQUEST_DURATION: DURATION_BUCKETS,
+    REQUEST_QUERIES: QUERY_BUCKETS,
+    IMAGE_UPLOAD_BYTES: IMAGE_BUCKETS,
+}
+
+
+# Файл с суммой метрик завершившихся процессов и файл блокировки каталога.
+AGGREGATE = 'aggregate.json'
+LOCK = '.lock'
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_metrics(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def merge_metrics(counters, histograms, data):
+    for name, labels, value in data['counters']:
+        counters[(name, tuple(map(tuple, labels)))] += value
+    for name, labels, histogram in data['histograms']:
+        total = histograms.setdefault(
+            (name, tuple(map(tuple, labels))),
+            {'buckets': [0] * len(BUCKETS[name]), 'sum': 0.0, 'count': 0}
+        )
+        for index, count in enumerate(histogram['buckets']):
+            total['buckets'][index] += count
+        total['sum'] += histogram['sum']
+        total['count'] += histogram['count']
+
+
+def dump_metrics(counters, histograms, **extra):
+    return json.dumps({
+        'counters': [
+            [name, labels, value]
+            for (name, labels), value in counters.items()
+        ],
+        'histograms': [
+            [name, labels, histogram]
+            for (name, labels), histogram in histograms.items()
+        ],
+        **extra,
+    })
+
+
+def write_atomic(path, content):
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(content)
+    os.replace(temporary, path)
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join(
+        f'{key}="{escape(value)}"' for key, value in pairs
+    )
+
+
+class MetricsStore:
+    '''Счетчики и гистограммы процесса, сохраняемые в файл.
+
+    Каждый процесс gunicorn из фонового потока раз в
+    METRICS_FLUSH_SECONDS пишет свой файл в METRICS_DIR, подменяя его
+    целиком через os.replace. Эндпоинт метрик складывает файлы всех
+    процессов. Файлы завершившихся воркеров при этом переносятся в
+    AGGREGATE: их счетчики не теряются, а каталог не растет с каждым
+    перезапуском. Живость процесса проверяется по pid, поэтому
+    METRICS_DIR не должен быть общим для нескольких хостов или
+    контейнеров.
+
+    Файлы пишут только процессы веб-сервера, вызвавшие enable() из
+    foodgram.wsgi. Команды manage.py (benchmark_api, shell и другие)
+    считают метрики только в памяти: их трафик не попадает в общие.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.path = None
+        self.dirty = False
+        self.flusher = None
+        self.counters = defaultdict(float)
+        self.histograms = {}
+
+    def changed(self):
+        '''Вызывается под self.lock перед изменением метрик.
+
+        После fork счетчики родителя не должны попасть в файл воркера,
+        а поток сохранения у каждого процесса свой.
+        '''
+
+        if self.pid != os.getpid():
+            self.reset()
+        self.dirty = True
+        if self.enabled and self.flusher is None:
+            self.flusher = threading.Thread(
+                target=self.run_flusher, name='metrics-flusher', daemon=True
+            )
+            self.flusher.start()
+
+    def run_flusher(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_SECONDS)
+            try:
+                self.flush()
+            except OSError:
+                logger.exception('Не удалось сохранить метрики')
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.changed()
+            self.counters[key] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        buckets = BUCKETS[name]
+        with self.lock:
+            self.changed()
+            histogram = self.histograms.setdefault(
+                key, {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            )
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def flush(self):
+        '''Сохраняет метрики процесса, если они менялись.'''
+
+        with self.lock:
+            if (
+                not self.enabled or not self.dirty
+                or self.pid != os.getpid()
+            ):
+                return
+            self.dirty = False
+            content = dump_metrics(self.counters, self.histograms)
+            if self.path is None:
+                directory = Path(settings.METRICS_DIR)
+                directory.mkdir(parents=True, exist_ok=True)
+                self.path = directory / f'{self.pid}-{time.time_ns()}.json'
+            write_atomic(self.path, content)
+
+    def fold_dead(self, directory):
+        '''Складывает файлы завершившихся процессов в AGGREGATE и удаляет
+        их. Вызывается под блокировкой каталога.
+
+        Имена сложенных файлов сохраняются в AGGREGATE: если процесс
+        упадет до их удаления, следующий вызов не учтет их дважды.
+        '''
+
+        dead = [
+            path for path in directory.glob('*-*.json')
+            if not is_alive(int(path.name.split('-')[0]))
+        ]
+        if not dead:
+            return
+        aggregate = directory / AGGREGATE
+        data = read_metrics(aggregate) or {
+            'counters': [], 'histograms': [], 'folded': []
+        }
+        counters = defaultdict(float)
+        histograms = {}
+        merge_metrics(counters, histograms, data)
+        folded = []
+        for path in dead:
+            if path.name not in data['folded']:
+                content = read_metrics(path)
+                if content is None:
+                    continue
+                merge_metrics(counters, histograms, content)
+            folded.append(path.name)
+        write_atomic(
+            aggregate, dump_metrics(counters, histograms, folded=folded)
+        )
+        for name in folded:
+            (directory / name).unlink(missing_ok=True)
+
+    def collect(self):
+        '''Сумма метрик всех процессов и число работающих процессов.
+        Метрики процесса без файла добавляются из памяти.
+        '''
+
+        self.flush()
+        counters = defaultdict(float)
+        histograms = {}
+        if not self.enabled:
+            with self.lock:
+                merge_metrics(counters, histograms, json.loads(
+                    dump_metrics(self.counters, self.histograms)
+                ))
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / LOCK, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.fold_dead(directory)
+            files = list(directory.glob('*.json'))
+            for path in files:
+                data = read_metrics(path)
+                if data is not None:
+                    merge_metrics(counters, histograms, data)
+        processes = sum(path.name != AGGREGATE for path in files)
+        return counters, histograms, processes
+
+
+store = MetricsStore()
+atexit.register(store.flush)
+
+
+def record_request(request, response, duration, queries=None):
+    handler = getattr(request, 'handler_name', 'other')
+    store.inc(
+        REQUESTS, handler=handler, method=request.method,
+        status=response.status_code
+    )
+    store.observe(REQUEST_DURATION, duration, handler=handler)
+    if queries is not None:
+        store.observe(REQUEST_QUERIES, queries, handler=handler)
+
+
+def record_cache(cache, hit):
+    store.inc(CACHE_REQUESTS, cache=cache, result='hit' if hit else 'miss')
+
+
+def cache_stats(cache):
+    '''Попадания и промахи кэша cache по всем процессам.'''
+
+    counters, _, _ = store.collect()
+    return {
+        'hits': int(counters.get(
+            (CACHE_REQUESTS, (('cache', cache), ('result', 'hit'))), 0
+        )),
+        'misses': int(counters.get(
+            (CACHE_REQUESTS, (('cache', cache), ('result', 'miss'))), 0
+        )),
+    }
+
+
+def render_histogram(lines, name, labels, histogram):
+    cumulative = 0
+    for bound, count in zip(BUCKETS[name], histogram['buckets']):
+        cumulative += count
+        lines.append(
+            f'{name}_bucket{format_labels(labels, le=bound)} {cumulative}'
+        )
+    lines.append(
+        f'{name}_bucket{format_labels(labels, le="+Inf")} '
+        f'{histogram["count"]}'
+    )
+    lines.append(f'{name}_sum{format_labels(labels)} {histogram["sum"]}')
+    lines.append(f'{name}_count{format_labels(labels)} {histogram["count"]}')
+
+
+def hit_ratios(counters):
+    totals = defaultdict(lambda: [0, 0])
+    for (name, labels), value in counters.items():
+        if name == CACHE_REQUESTS:
+            labels = dict(labels)
+            totals[labels['cache']][labels['result'] == 'hit'] += value
+    return {
+        (CACHE_HIT_RATIO, (('cache', cache), )): hits / (hits + misses)
+        for cache, (misses, hits) in totals.items()
+    }
+
+
+def render_metrics():
+    '''Метрики всех процессов в текстовом формате Prometheus.'''
+
+    counters, histograms, processes = store.collect()
+    gauges = {**hit_ratios(counters), (PROCESSES, ()): processes}
+    lines = []
+    for metric_type, values in (('counter', counters), ('gauge', gauges)):
+        for name in sorted({name for name, _ in values}):
+            lines += [f'# HELP {name} {HELP[name]}',
+                      f'# TYPE {name} {metric_type}']
+            lines += [
+                f'{name}{format_labels(labels)} {value}'
+                for (metric, labels), value in sorted(values.items())
+                if metric == name
+            ]
+    for name in sorted({name for name, _ in histograms}):
+        lines += [f'# HELP {name} {HELP[name]}', f'# TYPE {name} histogram']
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric == name:
+                render_histogram(lines, name, labels, histogram)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,124 @@
+from hashlib import md5
+
+from api.metrics import cache_stats, record_cache
+from api.replicas import use_primary
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, urlencode
+from recipes.versions import get_version
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+PRERENDERED_TIMEOUT = 60 * 60 * 24
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+
+def response_cache_stats():
+    return cache_stats('response')
+
+
+def normalize_query(query_params):
+    '''Строка запроса с отсортированными параметрами, чтобы ?b=2&a=1 и
+    ?a=1&b=2 попадали в одну запись кэша. Пустые значения сохраняются:
+    ?cursor= включает курсорную пагинацию и отвечает иначе, чем запрос
+    без параметров.
+    '''
+
+    return urlencode(sorted(
+        (key, value)
+        for key, values in query_params.lists()
+        for value in values
+    ))
+
+
+class PrerenderedListMixin:
+    '''Отдает список без параметров из заранее отрендеренного JSON.
+
+    ETag строится по версии набора данных version_name, поэтому
+    If-None-Match проверяется без обращения к БД, а кэш обновляется
+    при каждом изменении версии чтением с основной БД.
+    '''
+
+    version_name = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        version = get_version(self.version_name)
+        etag = f'"{self.version_name}-{version}"'
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        key = f'prerendered:{self.version_name}:{version}'
+        content = cache.get(key)
+        record_cache('prerendered', content is not None)
+        if content is None:
+            with use_primary():
+                data = super().list(request, *args, **kwargs).data
+            content = JSONRenderer().render(data)
+            cache.set(key, content, PRERENDERED_TIMEOUT)
+        response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+
+class AnonymousResponseCacheMixin:
+    '''Кэширует JSON ответов list и retrieve для анонимных польз-лей.
+
+    Ключ строится по пути, нормализованной строке запроса и версиям
+    наборов данных version_names: изменение любого из них делает
+    старые записи недоступными. Заголовок X-Cache показывает HIT/MISS.
+    Промахи читают с основной БД: иначе ответ отстающей реплики
+    сохранился бы под новой версией на весь RESPONSE_CACHE_TIMEOUT.
+    '''
+
+    version_names = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_response_cache_key(self, request):
+        versions = ':'.join(
+            str(get_version(name)) for name in self.version_names
+        )
+        url = md5(
+            f'{request.get_host()}{request.path}?'
+            f'{normalize_query(request.query_params)}'.encode()
+        ).hexdigest()
+        return f'response:{self.basename}:{self.action}:{versions}:{url}'
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if (
+            not request.user.is_anonymous
+            or request.accepted_renderer.format != 'json'
+        ):
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        content = cache.get(key)
+        record_cache('response', content is not None)
+        if content is not None:
+            response = HttpResponse(content, content_type='application/json')
+            response['X-Cache'] = 'HIT'
+            return response
+
+        with use_primary():
+            response = handler(request, *args, **kwargs)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        content = JSONRenderer().render(response.data)
+        cache.set(key, content, RESPONSE_CACHE_TIMEOUT)
+        response = HttpResponse(content, content_type='application/json')
+        response['X-Cache'] = 'MISS'
+        return response
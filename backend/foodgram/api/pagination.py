@@ -0,0 +1,132 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    '''Пагинация по ключу (pub_date, id) без OFFSET и COUNT(*).
+
+    Курсор хранит ключ крайнего объекта страницы и направление,
+    следующая страница выбирается условием по индексу (pub_date, id).
+    '''
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        reverse, position = self.decode_cursor(request)
+        return self.build_page(
+            list(self.seek(queryset, reverse, position)), reverse, position
+        )
+
+    def seek(self, queryset, reverse, position):
+        '''Не больше страницы и одного объекта после курсора.'''
+
+        if position is not None:
+            pub_date, pk = position
+            if reverse:
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+                )
+        ordering = ('pub_date', 'pk') if reverse else ('-pub_date', '-pk')
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def build_page(self, results, reverse, position):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next = self.previous = None
+        if results:
+            if has_more or reverse:
+                self.next = self.encode_cursor(results[-1], reverse=False)
+            if (has_more and reverse) or (position and not reverse):
+                self.previous = self.encode_cursor(results[0], reverse=True)
+        return results
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            direction, pub_date, pk = b64decode(
+                encoded.encode('ascii'), altchars=b'-_', validate=True
+            ).decode('ascii').split('|')
+            return direction == 'r', (datetime.fromisoformat(pub_date),
+                                      int(pk))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        token = '|'.join(
+            ('r' if reverse else 'f', obj.pub_date.isoformat(), str(obj.pk))
+        )
+        encoded = b64encode(token.encode('ascii'), altchars=b'-_')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode('ascii')
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.next),
+            ('previous', self.previous),
+            ('results', data),
+        ]))
+
+
+class FeedPagination(KeysetPagination):
+    '''Пагинация ленты по ключу, собранной из нескольких выборок
+    рецептов, которые возвращает view.get_feed_sources().
+
+    Из каждой выборки берутся только ключи (pub_date, id) одной
+    страницы, страница собирается их слиянием, а рецепты загружаются
+    одним запросом из queryset со всеми prefetch_related.
+    '''
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        reverse, position = self.decode_cursor(request)
+        keys = {
+            pk: pub_date
+            for source in view.get_feed_sources()
+            for pub_date, pk in self.seek(
+                source, reverse, position
+            ).values_list('pub_date', 'pk')
+        }
+        ids = sorted(
+            keys, key=lambda pk: (keys[pk], pk), reverse=not reverse
+        )[:self.page_size + 1]
+        recipes = queryset.in_bulk(ids)
+        return self.build_page(
+            [recipes[pk] for pk in ids if pk in recipes], reverse, position
+        )
+
+
+class RecipePagination(PageNumberPagination):
+    '''Постраничная пагинация рецептов, с параметром cursor - по ключу.'''
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
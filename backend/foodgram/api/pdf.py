@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from pathlib import Path
+
+import pdfkit
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+JOB_TIMEOUT = 60 * 60
+
+executor = None
+executor_lock = threading.Lock()
+last_purge = 0.0
+
+
+def pdfkit_renderer(html):
+    '''Рендерит HTML в PDF через wkhtmltopdf.'''
+
+    return pdfkit.from_string(html, False, options={'encoding': 'UTF-8'})
+
+
+def stub_renderer(html):
+    '''Заглушка без wkhtmltopdf для тестов и замеров.'''
+
+    return b'%PDF-1.4\n' + html.encode()
+
+
+def get_job_id(user_id, ingredients):
+    '''Id задачи - хэш польз-ля и содержимого его списка покупок,
+    поэтому одинаковый список рендерится один раз, а чужой id
+    не подобрать по содержимому.
+    '''
+
+    content = json.dumps(
+        [user_id, ingredients], ensure_ascii=False, sort_keys=True
+    )
+    return sha256(content.encode()).hexdigest()
+
+
+def get_path(user_id, job_id, suffix='.pdf'):
+    '''Файлы лежат в SHOPPING_LIST_PDF_ROOT вне MEDIA_ROOT, поэтому
+    отдаются только через проверяющий польз-ля эндпоинт.
+    '''
+
+    return Path(settings.SHOPPING_LIST_PDF_ROOT, str(user_id), job_id + suffix)
+
+
+def write_atomic(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f'.{path.name}.{threading.get_ident()}')
+    temporary.write_bytes(content)
+    os.replace(temporary, path)
+
+
+def is_expired(path, timeout):
+    try:
+        return path.stat().st_mtime < time.time() - timeout
+    except FileNotFoundError:
+        return True
+
+
+def set_status(user_id, job_id, status):
+    '''Статус хранится файлом рядом с PDF, поэтому его видят все
+    процессы gunicorn, а не только поставивший задачу.
+    '''
+
+    write_atomic(
+        get_path(user_id, job_id, '.json'), json.dumps(status).encode()
+    )
+
+
+def get_status(user_id, job_id):
+    if not is_expired(get_path(user_id, job_id),
+                      settings.SHOPPING_LIST_PDF_TTL):
+        return {'status': DONE}
+    path = get_path(user_id, job_id, '.json')
+    if is_expired(path, JOB_TIMEOUT):
+        return None
+    try:
+        status = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    # Метка pending остается, если процесс умер во время рендеринга.
+    # Просроченная считается неудачей, и submit ставит задачу заново.
+    if status['status'] == PENDING and is_expired(
+        path, settings.SHOPPING_LIST_PDF_RENDER_TIMEOUT
+    ):
+        return {'status': FAILED, 'errors': 'Рендеринг не завершился.'}
+    return status
+
+
+def purge_expired():
+    '''Удаляет PDF старше SHOPPING_LIST_PDF_TTL и статусы старше
+    JOB_TIMEOUT. Выполняется не чаще раза в JOB_TIMEOUT на процесс.
+    '''
+
+    global last_purge
+
+    if time.monotonic() - last_purge < JOB_TIMEOUT and last_purge:
+        return
+    last_purge = time.monotonic()
+    timeouts = {'.pdf': settings.SHOPPING_LIST_PDF_TTL, '.json': JOB_TIMEOUT}
+    for path in Path(settings.SHOPPING_LIST_PDF_ROOT).glob('*/*'):
+        if is_expired(path, timeouts.get(path.suffix, JOB_TIMEOUT)):
+            path.unlink(missing_ok=True)
+
+
+def render(user_id, job_id, ingredients):
+    '''Рендерит список покупок и сохраняет PDF.'''
+
+    try:
+        html = render_to_string(
+            'api/shopping_list.html', {'ingredients': ingredients}
+        )
+        renderer = import_string(settings.SHOPPING_LIST_PDF_RENDERER)
+        write_atomic(get_path(user_id, job_id), renderer(html))
+    except Exception as error:
+        logger.exception('Не удалось создать PDF списка покупок %s', job_id)
+        set_status(user_id, job_id, {'status': FAILED, 'errors': str(error)})
+    else:
+        get_path(user_id, job_id, '.json').unlink(missing_ok=True)
+
+
+def submit(user_id, ingredients):
+    '''Ставит рендеринг PDF в пул воркеров процесса, если такого
+    списка еще нет и он не рендерится. Возвращает id задачи и статус.
+    '''
+
+    global executor
+
+    purge_expired()
+    job_id = get_job_id(user_id, ingredients)
+    status = get_status(user_id, job_id)
+    if status is not None and status['status'] != FAILED:
+        return job_id, status
+
+    status = {'status': PENDING}
+    set_status(user_id, job_id, status)
+    if not settings.SHOPPING_LIST_PDF_WORKERS:
+        render(user_id, job_id, ingredients)
+        return job_id, get_status(user_id, job_id)
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=settings.SHOPPING_LIST_PDF_WORKERS,
+                thread_name_prefix='shopping-list-pdf'
+            )
+    executor.submit(render, user_id, job_id, ingredients)
+    return job_id, status
@@ -0,0 +1,69 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+SHOPPING_LIST_TITLE = 'Список покупок: \n'
+SHOPPING_LIST_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
+
+
+class Echo:
+    '''Псевдо-файл для csv.writer: возвращает строку вместо записи.'''
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListTextRenderer(BaseRenderer):
+    '''Список покупок в txt.'''
+
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = '\n'.join(str(value) for value in data.values())
+        return str(data).encode(self.charset)
+
+    def stream(self, ingredients):
+        yield SHOPPING_LIST_TITLE.encode(self.charset)
+        for ingredient in ingredients:
+            yield (
+                f'\n{ingredient["name"]} - {ingredient["amount"]} '
+                f'{ingredient["measurement_unit"]}'
+            ).encode(self.charset)
+
+
+class ShoppingListCSVRenderer(ShoppingListTextRenderer):
+    '''Список покупок в csv, с BOM для корректной кириллицы в Excel.'''
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield '\ufeff'.encode(self.charset)
+        yield writer.writerow(SHOPPING_LIST_HEADER).encode(self.charset)
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['name'],
+                ingredient['amount'],
+                ingredient['measurement_unit'],
+            )).encode(self.charset)
+
+
+class ShoppingListJSONRenderer(JSONRenderer):
+    '''Список покупок в json.'''
+
+    charset = 'utf-8'
+
+    def stream(self, ingredients):
+        yield b'['
+        separator = b''
+        for ingredient in ingredients:
+            yield separator + json.dumps(
+                ingredient, ensure_ascii=False
+            ).encode(self.charset)
+            separator = b',\n'
+        yield b']'
@@ -0,0 +1,95 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA = 'replica'
+# app_label модели таблицы DatabaseCache.
+CACHE_APP_LABEL = 'django_cache'
+
+# Чтение с реплики разрешает только ReplicaRoutingMiddleware, поэтому
+# команды, миграции и фоновые потоки всегда читают с основной БД.
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def use_primary():
+    '''Чтение с основной БД внутри блока, например при заполнении
+    кэша, чтобы отставание реплики не закрепилось в нем надолго.
+    '''
+
+    token = read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    '''Запись - в основную БД, чтение - с реплики, если она настроена
+    и текущий запрос ее разрешает.
+    '''
+
+    def db_for_read(self, model, **hints):
+        # Кэш в БД хранит версии: прочитанные с отстающей реплики, они
+        # вернули бы устаревшие данные под новой версией.
+        if model._meta.app_label == CACHE_APP_LABEL:
+            return DEFAULT_DB_ALIAS
+        if replica_configured() and read_from_replica.get():
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    '''Направляет чтение безопасных запросов на реплику.
+
+    После успешного изменяющего запроса ставит cookie, и следующие
+    REPLICA_STICKY_SECONDS секунд польз-ль читает с основной БД и видит
+    свои изменения, даже если реплика отстает.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+
+        safe = request.method in SAFE_METHODS
+        token = read_from_replica.set(safe and not self.is_sticky(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_from_replica.reset(token)
+        if not safe and response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                str(int(time.time()) + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+    def is_sticky(self, request):
+        try:
+            until = int(request.COOKIES[settings.REPLICA_STICKY_COOKIE])
+        except (KeyError, ValueError):
+            return False
+        return until > time.time()
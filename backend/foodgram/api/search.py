@@ -0,0 +1,224 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from api.replicas import use_primary
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from recipes.models import Ingredient, Recipe
+from recipes.search import SEARCH_CONFIG, uses_search_vector
+from recipes.versions import INGREDIENTS, RECIPES, get_version
+
+MAX_SEARCH_TERMS = 8
+MIN_STEM_LENGTH = 3
+VOWEL_ENDINGS = 'аеиоуыэюяйь'
+NAME_WEIGHT = 1.0
+TEXT_WEIGHT = 0.4
+
+
+def normalize(text):
+    '''Приводит строку к виду для поиска: нижний регистр, ё -> е.'''
+
+    return text.lower().replace('ё', 'е')
+
+
+def tokenize(text):
+    return re.findall(r'\w+', normalize(text))
+
+
+def stem(term):
+    '''Грубая замена стеммера: отбрасывает гласные окончания, чтобы
+    "курица" находила "курицей" поиском по префиксу.
+    '''
+
+    stemmed = term.rstrip(VOWEL_ENDINGS)
+    return stemmed if len(stemmed) >= MIN_STEM_LENGTH else term
+
+
+class IngredientIndex:
+    '''Префиксный индекс ингредиентов в памяти процесса.
+
+    Строится лениво из таблицы Ingredient и перестраивается,
+    когда меняется версия INGREDIENTS. Читает с основной БД: индекс,
+    построенный по отстающей реплике, остался бы с новой версией
+    до следующего изменения.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.keys = []
+        self.items = []
+
+    def refresh(self):
+        version = get_version(INGREDIENTS)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            with use_primary():
+                rows = sorted(
+                    (normalize(name), pk, name, unit)
+                    for pk, name, unit in Ingredient.objects.values_list(
+                        'pk', 'name', 'measurement_unit'
+                    )
+                )
+            self.keys, self.items = [row[0] for row in rows], [
+                Ingredient(pk=pk, name=name, measurement_unit=unit)
+                for _, pk, name, unit in rows
+            ]
+            self.version = version
+
+    def search(self, query, limit):
+        '''Ингредиенты, название которых совпадает с query, начинается
+        с него или содержит его, именно в таком порядке.
+        '''
+
+        self.refresh()
+        keys, items = self.keys, self.items
+        query = normalize(query)
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\uffff', start)
+        exact = [i for i in range(start, end) if keys[i] == query]
+        found = exact + [i for i in range(start, end) if keys[i] != query]
+        if len(found) < limit:
+            found += [
+                i for i, key in enumerate(keys)
+                if query in key and not key.startswith(query)
+            ]
+        return [items[i] for i in found[:limit]]
+
+
+ingredient_index = IngredientIndex()
+
+
+class RecipeIndex:
+    '''Инвертированный индекс названий и описаний рецептов в памяти
+    процесса для БД без полнотекстового поиска.
+
+    Перестраивается, когда меняется версия RECIPES, чтением с
+    основной БД, как и IngredientIndex.
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.tokens = []
+        self.postings = {}
+
+    def refresh(self):
+        version = get_version(RECIPES)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            postings = defaultdict(lambda: defaultdict(float))
+            rows = Recipe.objects.values_list('pk', 'name', 'text')
+            with use_primary():
+                for pk, name, text in rows.iterator():
+                    for token in tokenize(name):
+                        postings[token][pk] += NAME_WEIGHT
+                    for token in tokenize(text):
+                        postings[token][pk] += TEXT_WEIGHT
+            self.tokens = sorted(postings)
+            self.postings = {
+                token: dict(weights) for token, weights in postings.items()
+            }
+            self.version = version
+
+    def search(self, terms):
+        '''id рецептов, содержащих слова, которые начинаются с каждого
+        из terms, по убыванию веса совпадений, затем новые раньше.
+        '''
+
+        self.refresh()
+        tokens, postings = self.tokens, self.postings
+        scores = None
+        for term in terms:
+            start = bisect_left(tokens, term)
+            end = bisect_left(tokens, term + '\uffff', start)
+            matched = defaultdict(float)
+            for token in tokens[start:end]:
+                for pk, weight in postings[token].items():
+                    matched[pk] += weight
+            if scores is not None:
+                matched = {
+                    pk: weight + scores[pk]
+                    for pk, weight in matched.items() if pk in scores
+                }
+            scores = matched
+            if not scores:
+                return []
+        return sorted(scores, key=lambda pk: (-scores[pk], -pk))
+
+
+recipe_index = RecipeIndex()
+
+
+def is_empty_tsquery(connection, raw_query):
+    '''Запрос только из стоп-слов ("с", "и") PostgreSQL превращает
+    в пустой tsquery, которому не соответствует ни один рецепт.
+    '''
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT numnode(to_tsquery(%s::regconfig, %s))',
+            [SEARCH_CONFIG, raw_query]
+        )
+        return not cursor.fetchone()[0]
+
+
+def search_by_prefix(queryset, terms):
+    '''Рецепты, в названии или описании которых есть слово,
+    начинающееся с каждого из terms, новые раньше.
+    '''
+
+    for term in terms:
+        queryset = queryset.filter(
+            Q(name__istartswith=term) | Q(name__icontains=f' {term}')
+            | Q(text__istartswith=term) | Q(text__icontains=f' {term}')
+        )
+    return queryset.order_by('-pub_date', '-id')
+
+
+def search_recipes(queryset, query):
+    '''Рецепты, в названии или описании которых есть слова,
+    начинающиеся с каждого слова запроса, по убыванию релевантности.
+
+    В PostgreSQL используется tsvector с GIN-индексом и ts_rank, а
+    запрос из одних стоп-слов ищется по префиксу. В остальных БД -
+    RecipeIndex и только RECIPE_SEARCH_LIMIT лучших совпадений: их id
+    и позиции попадают в SQL запроса.
+    '''
+
+    connection = connections[queryset.db]
+    if uses_search_vector(connection):
+        terms = re.findall(r'\w+', query.lower())[:MAX_SEARCH_TERMS]
+        if not terms:
+            return queryset
+        raw_query = ' & '.join(f'{term}:*' for term in terms)
+        if is_empty_tsquery(connection, raw_query):
+            return search_by_prefix(queryset, terms)
+        search_query = SearchQuery(
+            raw_query, search_type='raw', config=SEARCH_CONFIG
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-pub_date', '-id')
+
+    terms = [stem(term) for term in tokenize(query)[:MAX_SEARCH_TERMS]]
+    if not terms:
+        return queryset
+    found = recipe_index.search(terms)[:settings.RECIPE_SEARCH_LIMIT]
+    if not found:
+        return queryset.none()
+    return queryset.filter(pk__in=found).order_by(Case(
+        *[When(pk=pk, then=Value(position))
+          for position, pk in enumerate(found)],
+        output_field=IntegerField()
+    ))
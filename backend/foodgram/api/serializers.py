@@ -1,8 +1,13 @@
+from api.fields import Base64ImageField
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_base64.fields import Base64ImageField
+from recipes.images import SOURCE, THUMBNAIL
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                             ShoppingCart, Subscription, Tag)
+from recipes.relations import (FAVORITES, FOLLOWING, SHOPPING_CART,
+                               get_relations)
 from rest_framework import serializers
 
 User = get_user_model()
@@ -46,12 +51,8 @@ class CustomUserSerializer(UserSerializer):
     def get_is_subscribed(self, obj):
         '''Проверка на подписку.'''
 
-        user = self.context['request'].user
-        if user.is_anonymous:
-            return False
-        return Subscription.objects.filter(
-            user=user, author=obj
-        ).select_related().exists()
+        relations = get_relations(self.context['request'])
+        return obj.pk in relations[FOLLOWING]
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -65,9 +66,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 class IngredientRecipeSerializer(serializers.ModelSerializer):
     '''Сериализатор для связанной моедли IngredientRecipe.'''
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(), source='ingredient.id'
-    )
+    id = serializers.IntegerField(source='ingredient.id')
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit'
@@ -90,6 +89,11 @@ class FavoriteSerializer(serializers.ModelSerializer):
         model = Favorite
         fields = ('id', 'name', 'image', 'cooking_time')
 
+    def to_representation(self, instance):
+        return PreviewRecipeSerializer(
+            instance.recipe, context=self.context
+        ).data
+
 
 class ShoppingCartSerializer(FavoriteSerializer):
     '''Список покупок.'''
@@ -107,19 +111,69 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
+class TagListField(serializers.ListField):
+    '''Теги рецепта: список id на запись, описание тегов на чтение.'''
+
+    child = serializers.IntegerField()
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('allow_empty', False)
+        super().__init__(**kwargs)
+
+    def to_representation(self, data):
+        return TagSerializer(data.all(), many=True).data
+
+
 class PreviewRecipeSerializer(serializers.ModelSerializer):
     '''Превью рецептов.'''
 
     image = Base64ImageField()
+    image_srcset = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
+
+    def use_thumbnail(self):
+        '''В превью вместо оригинала отдается уменьшенная копия.'''
+
+        return True
+
+    def build_image_url(self, recipe, name):
+        url = recipe.image.storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def get_image_srcset(self, obj):
+        '''Уменьшенные копии картинки по форматам, в виде srcset.'''
+
+        srcset = {}
+        for key, name in obj.image_derivatives.items():
+            if key == SOURCE:
+                continue
+            width, extension = key.split('.')
+            srcset.setdefault(extension, []).append(
+                f'{self.build_image_url(obj, name)} {width}w'
+            )
+        return {
+            extension: ', '.join(images)
+            for extension, images in srcset.items()
+        }
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        thumbnail = instance.image_derivatives.get(THUMBNAIL)
+        if thumbnail and self.use_thumbnail():
+            data['image'] = self.build_image_url(instance, thumbnail)
+        return data
 
 
 class RecipeSerializer(PreviewRecipeSerializer):
     '''Полное описание рецептов.'''
 
+    tags = TagListField()
     author = CustomUserSerializer(read_only=True)
     ingredients = IngredientRecipeSerializer(source='recipes', many=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
@@ -130,14 +184,114 @@ class RecipeSerializer(PreviewRecipeSerializer):
         fields = (
             'id', 'tags', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time'
+            'name', 'image', 'image_srcset', 'text', 'cooking_time'
         )
 
+    def use_thumbnail(self):
+        '''Уменьшенная копия отдается только в списке рецептов.'''
+
+        return isinstance(self.parent, serializers.ListSerializer)
+
     def to_representation(self, instance):
-        data = super().to_representation(instance)
-        data['tags'] = TagSerializer(instance.tags, many=True).data
-        return data
+        if 'recipes' not in getattr(instance, '_prefetched_objects_cache', {}):
+            prefetch_related_objects(
+                [instance],
+                'tags',
+                Prefetch(
+                    'recipes',
+                    queryset=IngredientRecipe.objects.select_related(
+                        'ingredient'
+                    )
+                )
+            )
+        return super().to_representation(instance)
+
+    def validate_ingredients(self, value):
+        ingredients = [item['ingredient']['id'] for item in value]
+        if len(ingredients) != len(set(ingredients)):
+            raise serializers.ValidationError(
+                'Ингредиенты в рецепте не должны повторяться!'
+            )
+        return value
+
+    def resolve_ids(self, model, ids, errors, field_name):
+        '''Загружает объекты по списку id одним запросом IN,
+        несуществующие id добавляет в errors.
+        '''
+
+        objects = model.objects.in_bulk(ids)
+        message = serializers.PrimaryKeyRelatedField.default_error_messages[
+            'does_not_exist'
+        ]
+        unknown = [message.format(pk_value=pk) for pk in ids
+                   if pk not in objects]
+        if unknown:
+            errors[field_name] = unknown
+        return objects
+
+    def validate(self, attrs):
+        '''Проверяет id тегов и ингредиентов пакетно и передает
+        в create/update уже загруженные объекты.
+        '''
+
+        errors = {}
+        if 'tags' in attrs:
+            tags = self.resolve_ids(Tag, attrs['tags'], errors, 'tags')
+            attrs['tags'] = list(tags.values())
+        if 'recipes' in attrs:
+            ingredients = self.resolve_ids(
+                Ingredient,
+                [item['ingredient']['id'] for item in attrs['recipes']],
+                errors,
+                'ingredients'
+            )
+            attrs['recipes'] = [
+                {
+                    'ingredient': ingredients.get(item['ingredient']['id']),
+                    'amount': item['amount']
+                }
+                for item in attrs['recipes']
+            ]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def save_ingredients(self, recipe, ingredients, created=False):
+        '''Приводит ингредиенты рецепта к переданному набору: добавляет,
+        обновляет и удаляет только отличающиеся строки пакетными запросами.
+        '''
+
+        amounts = {
+            value['ingredient'].id: value['amount']
+            for value in ingredients
+        }
+        existing = {}
+        to_update = []
+        to_delete = []
+        if not created:
+            for row in IngredientRecipe.objects.filter(recipe=recipe):
+                if (row.ingredient_id not in amounts
+                        or row.ingredient_id in existing):
+                    to_delete.append(row.pk)
+                    continue
+                existing[row.ingredient_id] = row
+                if row.amount != amounts[row.ingredient_id]:
+                    row.amount = amounts[row.ingredient_id]
+                    to_update.append(row)
+
+        if to_delete:
+            IngredientRecipe.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            IngredientRecipe.objects.bulk_update(to_update, ['amount'])
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
 
         tags = validated_data.pop('tags')
@@ -145,14 +299,10 @@ class RecipeSerializer(PreviewRecipeSerializer):
 
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-
-        for value in recipes:
-            ingredient = value.get('ingredient')['id']
-            amount = value.get('amount')
-            IngredientRecipe.objects.create(
-                ingredient=ingredient, recipe=recipe, amount=amount)
+        self.save_ingredients(recipe, recipes, created=True)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
 
         instance.name = validated_data.get('name', instance.name)
@@ -167,14 +317,7 @@ class RecipeSerializer(PreviewRecipeSerializer):
             instance.tags.set(tags)
 
         if 'recipes' in validated_data:
-            IngredientRecipe.objects.filter(recipe=instance).all().delete()
-            ingredients = validated_data.get('recipes')
-            for value in ingredients:
-                ingredient = value.get('ingredient')['id']
-                amount = value.get('amount')
-                IngredientRecipe.objects.create(
-                    recipe=instance, ingredient=ingredient, amount=amount
-                )
+            self.save_ingredients(instance, validated_data.get('recipes'))
 
         instance.save()
         return instance
@@ -182,22 +325,14 @@ class RecipeSerializer(PreviewRecipeSerializer):
     def get_is_favorited(self, obj):
         '''Проверка - добавлен ли рецепт в избранное.'''
 
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return Favorite.objects.filter(
-                user=user, recipe=obj
-            ).select_related().exists()
-        return False
+        relations = get_relations(self.context['request'])
+        return obj.pk in relations[FAVORITES]
 
     def get_is_in_shopping_cart(self, obj):
         '''Проверка - добавлен ли рецепт в список покупок.'''
 
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return ShoppingCart.objects.filter(
-                user=user, recipe=obj
-            ).select_related().exists()
-        return False
+        relations = get_relations(self.context['request'])
+        return obj.pk in relations[SHOPPING_CART]
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -210,7 +345,9 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     last_name = serializers.CharField(source='author.last_name')
     is_subscribed = serializers.SerializerMethodField(read_only=True)
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
+    recipes_count = serializers.IntegerField(
+        source='author.recipes_count', read_only=True
+    )
 
     class Meta:
         model = Subscription
@@ -228,29 +365,25 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     def get_is_subscribed(self, obj):
         '''Проверка на подписку.'''
 
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return Subscription.objects.filter(
-                user=user, author=obj.author
-            ).select_related().exists()
-        return False
+        request = self.context['request']
+        if obj.user_id == request.user.id:
+            return True
+        return obj.author_id in get_relations(request)[FOLLOWING]
 
     def get_recipes(self, obj):
         '''Превью рецептов автора, на которого подписан.'''
 
         request = self.context['request']
-        recipes = Recipe.objects.filter(author=obj.author).select_related()
-        limit = request.GET.get('recipes_limit')
-        if limit:
-            recipes = recipes[:int(limit)]
+        if hasattr(obj.author, 'preview_recipes'):
+            recipes = obj.author.preview_recipes
+        else:
+            recipes = Recipe.objects.filter(
+                author=obj.author
+            ).select_related()
+            limit = request.GET.get('recipes_limit')
+            if limit:
+                recipes = recipes[:int(limit)]
         return PreviewRecipeSerializer(
             recipes, many=True,
             context={'request': request}
         ).data
-
-    def get_recipes_count(self, obj):
-        '''Возвращает количество рецептов у автора, на которого подписан.'''
-
-        return Recipe.objects.filter(
-            author=obj.author
-        ).select_related().count()
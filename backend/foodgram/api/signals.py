@@ -0,0 +1,21 @@
+from api.authentication import forget_tokens, forget_user_tokens
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    '''Смена пароля, is_active и других полей сбрасывает снимок
+    польз-ля в кэше. Обновление одного last_login при входе - нет.
+    '''
+
+    if raw or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    forget_user_tokens([instance.pk])
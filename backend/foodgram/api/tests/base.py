@@ -0,0 +1,124 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from api.metrics import store
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Subscription, Tag)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+CACHE_DIR = tempfile.mkdtemp()
+MEDIA_ROOT = tempfile.mkdtemp()
+METRICS_DIR = tempfile.mkdtemp()
+
+
+def image_bytes(size=(40, 30), color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def image_data_uri(size=(40, 30), color='red'):
+    encoded = base64.b64encode(image_bytes(size, color)).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+# Кэш в файлах общий для процессов, как и в продакшене, но, в отличие
+# от кэша в БД, не добавляет запросов к числу, которое проверяют тесты.
+@override_settings(
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    }},
+    MEDIA_ROOT=MEDIA_ROOT,
+    METRICS_DIR=METRICS_DIR,
+    REQUEST_TIMING_SAMPLE_RATE=0,
+)
+class FoodgramTestCase(TestCase):
+    '''Польз-ли, теги, ингредиенты и рецепты с избранным, списком
+    покупок и подписками. Кэш очищается перед каждым тестом.
+    '''
+
+    recipes_per_author = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user', password='pass',
+            first_name='Иван', last_name='Иванов'
+        )
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}', password='pass',
+                first_name='Анна', last_name='Смирнова'
+            )
+            for number in range(3)
+        ]
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag-{number}'
+            )
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(10)
+        ]
+        cls.recipes = []
+        for author in cls.authors:
+            for number in range(cls.recipes_per_author):
+                recipe = Recipe(
+                    author=author, name=f'Рецепт {author.pk}-{number}',
+                    text='Описание', cooking_time=10
+                )
+                recipe.image.save(
+                    'recipe.png', ContentFile(image_bytes()), save=False
+                )
+                recipe.save()
+                recipe.tags.set(cls.tags[:number % 3 + 1])
+                IngredientRecipe.objects.bulk_create(
+                    IngredientRecipe(
+                        recipe=recipe, ingredient=ingredient, amount=100
+                    )
+                    for ingredient in cls.ingredients[number:number + 3]
+                )
+                cls.recipes.append(recipe)
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in cls.recipes[::3]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscription.objects.create(user=cls.user, author=cls.authors[0])
+        cls.token = Token.objects.create(user=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        # Метрики тестов не сохраняются в уже удаленный METRICS_DIR.
+        store.reset()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = self.client_for(self.user)
+
+    def client_for(self, user):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
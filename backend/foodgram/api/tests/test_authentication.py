@@ -0,0 +1,63 @@
+from unittest import mock
+
+from api.authentication import forget_user_tokens, token_cache_key
+from api.tests.base import FoodgramTestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+User = get_user_model()
+
+
+@mock.patch('api.authentication.transaction.on_commit', lambda func: func())
+class CachedTokenAuthenticationTest(FoodgramTestCase):
+
+    def get_me(self):
+        return self.client.get('/api/users/me/')
+
+    def get_me_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_me()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [query['sql'] for query in queries]
+
+    def test_token_is_read_once(self):
+        self.get_me()
+        # Остается один запрос полей польз-ля для ответа /users/me/.
+        queries = self.get_me_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('authtoken_token', queries[0])
+        self.assertEqual(self.get_me().json()['email'], self.user.email)
+
+    def test_password_is_not_cached(self):
+        self.get_me()
+        self.assertEqual(
+            cache.get(token_cache_key(self.token.key)), (self.user.pk, True)
+        )
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_process_local_cache_is_not_used(self):
+        self.get_me()
+        self.assertIn('authtoken_token', self.get_me_queries()[0])
+
+    def test_save_forgets_cached_user(self):
+        self.get_me()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(
+            self.get_me().status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_queryset_update_needs_forget_user_tokens(self):
+        self.get_me()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.get_me().status_code, status.HTTP_200_OK)
+        forget_user_tokens([self.user.pk])
+        self.assertEqual(
+            self.get_me().status_code, status.HTTP_401_UNAUTHORIZED
+        )
@@ -0,0 +1,54 @@
+from unittest import mock
+
+from api.pagination import FeedPagination
+from api.tests.base import FoodgramTestCase
+from django.test import override_settings
+from recipes.models import FeedEntry, Recipe, Subscription
+from rest_framework import status
+
+
+@mock.patch.object(FeedPagination, 'page_size', 3)
+class FeedTest(FoodgramTestCase):
+    '''Лента /api/recipes/feed/ по страницам в обе стороны.'''
+
+    def expected(self, authors):
+        return list(
+            Recipe.objects.filter(author__in=authors)
+            .order_by('-pub_date', '-id').values_list('pk', flat=True)
+        )
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def walk(self):
+        '''id рецептов всех страниц и ответы по порядку.'''
+
+        pages = [self.get('/api/recipes/feed/')]
+        while pages[-1]['next']:
+            pages.append(self.get(pages[-1]['next']))
+        ids = [recipe['id'] for page in pages for recipe in page['results']]
+        return ids, pages
+
+    def test_pages_cover_feed_once(self):
+        Subscription.objects.create(user=self.user, author=self.authors[1])
+        ids, pages = self.walk()
+        self.assertEqual(ids, self.expected(self.authors[:2]))
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['previous'])
+
+        previous = self.get(pages[1]['previous'])
+        self.assertEqual(previous['results'], pages[0]['results'])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_popular_author_recipes_are_merged(self):
+        Subscription.objects.create(user=self.user, author=self.authors[2])
+        self.assertFalse(
+            FeedEntry.objects.filter(recipe__author=self.authors[2]).exists()
+        )
+        # Рецепты authors[0] есть и в ленте, и в выборке популярных.
+        ids, _ = self.walk()
+        self.assertEqual(
+            ids, self.expected([self.authors[0], self.authors[2]])
+        )
@@ -0,0 +1,52 @@
+from api.filters import RecipeFilter
+from api.tests.base import FoodgramTestCase
+from django.db import connection
+from django.http import QueryDict
+from recipes.models import Recipe
+from rest_framework.test import APIRequestFactory
+
+
+class RecipeFilterPlanTest(FoodgramTestCase):
+    '''Фильтры рецептов - подзапросы EXISTS по индексам, без дублей.'''
+
+    def filter(self, query):
+        request = APIRequestFactory().get('/api/recipes/')
+        request.user = self.user
+        return RecipeFilter(
+            QueryDict(query), Recipe.objects.all(), request=request
+        ).qs
+
+    def test_multiple_tags_do_not_duplicate_recipes(self):
+        ids = list(
+            self.filter('tags=tag-0&tags=tag-1&tags=tag-2')
+            .values_list('pk', flat=True)
+        )
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), {recipe.pk for recipe in self.recipes})
+
+    def test_combined_filter_results(self):
+        ids = set(self.filter(
+            'tags=tag-1&is_favorited=1&is_in_shopping_cart=1'
+        ).values_list('pk', flat=True))
+        expected = {
+            recipe.pk for recipe in self.recipes
+            if recipe.tags.filter(slug='tag-1').exists()
+            and recipe.favorites.filter(user=self.user).exists()
+            and recipe.shopping_carts.filter(user=self.user).exists()
+        }
+        self.assertTrue(expected)
+        self.assertEqual(ids, expected)
+
+    def test_combined_filter_uses_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Проверяется план EXPLAIN QUERY PLAN SQLite.')
+        queryset = self.filter(
+            'tags=tag-0&tags=tag-1&is_favorited=1&is_in_shopping_cart=1'
+        )
+        plan = queryset.explain()
+        searches = [line for line in plan.splitlines() if 'SEARCH' in line]
+        self.assertEqual(len(searches), 3, plan)
+        for line in searches:
+            self.assertIn('USING COVERING INDEX', line)
+        self.assertNotIn('SCAN U0', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,98 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from api.metrics import AGGREGATE, REQUESTS, store
+from api.tests.base import FoodgramTestCase
+from django.conf import settings
+from django.test import override_settings
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return process.pid
+
+
+class MetricsTest(FoodgramTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Каталог общий для классов тестов и удаляется после каждого.
+        Path(settings.METRICS_DIR).mkdir(exist_ok=True)
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            path.unlink()
+        store.reset()
+
+    def write_dead_file(self, value):
+        path = Path(settings.METRICS_DIR, f'{dead_pid()}-1.json')
+        path.write_text(json.dumps({
+            'counters': [[REQUESTS, [['handler', 'dead']], value]],
+            'histograms': [],
+        }))
+        return path
+
+    def dead_requests(self):
+        counters, _, _ = store.collect()
+        return counters[(REQUESTS, (('handler', 'dead'), ))]
+
+    def test_dead_process_files_are_folded_once(self):
+        first = self.write_dead_file(3)
+        self.assertEqual(self.dead_requests(), 3)
+        self.assertFalse(first.exists())
+        self.assertTrue(Path(settings.METRICS_DIR, AGGREGATE).exists())
+
+        self.write_dead_file(4)
+        self.assertEqual(self.dead_requests(), 7)
+        self.assertEqual(self.dead_requests(), 7)
+        self.assertEqual(
+            [path.name for path in Path(settings.METRICS_DIR).glob('*.json')],
+            [AGGREGATE]
+        )
+
+    def test_file_left_after_crash_is_not_counted_twice(self):
+        path = self.write_dead_file(5)
+        content = path.read_text()
+        self.dead_requests()
+        path.write_text(content)
+        aggregate = Path(settings.METRICS_DIR, AGGREGATE)
+        data = json.loads(aggregate.read_text())
+        self.assertEqual(data['folded'], [path.name])
+        self.assertEqual(self.dead_requests(), 5)
+        self.assertFalse(path.exists())
+
+    def test_only_enabled_store_writes_files(self):
+        store.inc(REQUESTS, handler='command')
+        store.flush()
+        self.assertEqual(list(Path(settings.METRICS_DIR).glob('*.json')), [])
+        counters, _, processes = store.collect()
+        self.assertEqual(counters[(REQUESTS, (('handler', 'command'), ))], 1)
+        self.assertEqual(processes, 0)
+
+        store.enable()
+        try:
+            store.inc(REQUESTS, handler='server')
+            store.flush()
+        finally:
+            store.enabled = False
+        self.assertEqual(
+            [path.name for path in Path(settings.METRICS_DIR).glob('*.json')],
+            [store.path.name]
+        )
+
+    @override_settings(METRICS_TOKEN='')
+    def test_endpoint_requires_token_unless_debug(self):
+        self.assertEqual(self.anonymous.get('/api/metrics/').status_code, 404)
+        with override_settings(DEBUG=True):
+            response = self.anonymous.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_checks_token(self):
+        self.assertEqual(self.anonymous.get('/api/metrics/').status_code, 403)
+        response = self.anonymous.get(
+            '/api/metrics/', HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'foodgram_metrics_processes', response.content)
@@ -0,0 +1,90 @@
+from contextlib import ExitStack
+from unittest import mock
+
+from api.pagination import KeysetPagination, RecipePagination
+from api.tests.base import FoodgramTestCase
+from django.core.cache import cache
+from rest_framework import status
+
+
+class RecipeQueryCountTests(FoodgramTestCase):
+    '''Число запросов к БД не зависит от числа рецептов в ответе.
+
+    Кэши очищаются перед каждым запросом, поэтому для польз-ля в число
+    входят проверка токена и загрузка его избранного, списка покупок
+    и подписок.
+    '''
+
+    def assert_queries(self, client, url, expected):
+        cache.clear()
+        with self.assertNumQueries(expected):
+            response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+        return response.json()
+
+    def urls(self):
+        '''Адреса и число запросов сверх базового: курсор не считает
+        COUNT(*), фильтры tags и author проверяют теги и автора.
+        '''
+
+        author = self.authors[0].pk
+        return {
+            '/api/recipes/': 0,
+            '/api/recipes/?page=2': 0,
+            '/api/recipes/?cursor=': -1,
+            '/api/recipes/?tags=tag-0&tags=tag-1': 1,
+            f'/api/recipes/?author={author}': 1,
+            '/api/recipes/?is_favorited=1': 0,
+            '/api/recipes/?is_in_shopping_cart=1': 0,
+            (
+                f'/api/recipes/?tags=tag-0&tags=tag-2&author={author}'
+                '&is_favorited=1&is_in_shopping_cart=1'
+            ): 2,
+        }
+
+    def test_list_and_filters_anonymous(self):
+        for url, extra in self.urls().items():
+            with self.subTest(url):
+                self.assert_queries(self.anonymous, url, 4 + extra)
+
+    def test_list_and_filters_authenticated(self):
+        for url, extra in self.urls().items():
+            with self.subTest(url):
+                self.assert_queries(self.client, url, 8 + extra)
+
+    def test_retrieve(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        for client, expected in ((self.anonymous, 3), (self.client, 7)):
+            with self.subTest(authenticated=client is self.client):
+                data = self.assert_queries(client, url, expected)
+                self.assertEqual(len(data['ingredients']), 3)
+
+    def test_filters_narrow_results(self):
+        data = self.assert_queries(
+            self.client, '/api/recipes/?is_favorited=1', 8
+        )
+        self.assertEqual(data['count'], len(self.recipes[::2]))
+        self.assertTrue(all(item['is_favorited'] for item in data['results']))
+
+    def test_page_size_does_not_change_query_count(self):
+        '''Страница из 2 и из всех 12 рецептов - одно число запросов,
+        поэтому N+1 по рецептам страницы сломает тест.
+        '''
+
+        cases = (
+            (self.anonymous, '/api/recipes/', 4),
+            (self.anonymous, '/api/recipes/?cursor=', 3),
+            (self.client, '/api/recipes/', 8),
+            (self.client, '/api/recipes/?cursor=', 7),
+        )
+        for size in (2, len(self.recipes)):
+            with ExitStack() as patches:
+                for pagination in (RecipePagination, KeysetPagination):
+                    patches.enter_context(
+                        mock.patch.object(pagination, 'page_size', size)
+                    )
+                for client, url, expected in cases:
+                    with self.subTest(url=url, size=size,
+                                      authenticated=client is self.client):
+                        data = self.assert_queries(client, url, expected)
+                        self.assertEqual(len(data['results']), size)
@@ -0,0 +1,56 @@
+from api.tests.base import FoodgramTestCase, image_data_uri
+from recipes.models import Recipe
+from rest_framework import status
+
+
+class RecipeValidationTests(FoodgramTestCase):
+
+    def payload(self, **changes):
+        payload = {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+            'image': image_data_uri(),
+            'tags': [self.tags[0].pk],
+            'ingredients': [
+                {'id': self.ingredients[0].pk, 'amount': 10},
+            ],
+        }
+        payload.update(changes)
+        return payload
+
+    def test_empty_tags_rejected(self):
+        response = self.client.post(
+            '/api/recipes/', self.payload(tags=[]), format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', response.json())
+        self.assertFalse(Recipe.objects.filter(name='Новый рецепт').exists())
+
+    def test_unknown_ids_reported_together(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.payload(
+                tags=[self.tags[0].pk, 9001, 9002],
+                ingredients=[
+                    {'id': self.ingredients[0].pk, 'amount': 10},
+                    {'id': 9101, 'amount': 1},
+                    {'id': 9102, 'amount': 1},
+                ]
+            ),
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertEqual(len(errors['tags']), 2)
+        self.assertTrue(all(
+            str(pk) in message
+            for pk, message in zip((9001, 9002), errors['tags'])
+        ))
+        self.assertEqual(len(errors['ingredients']), 2)
+        self.assertTrue(all(
+            str(pk) in message
+            for pk, message in zip((9101, 9102), errors['ingredients'])
+        ))
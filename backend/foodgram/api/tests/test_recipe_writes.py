@@ -0,0 +1,91 @@
+from api.tests.base import FoodgramTestCase, image_data_uri
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class RecipeWriteStatementTests(FoodgramTestCase):
+    '''Запись ингредиентов рецепта разницей: число запросов не зависит
+    от числа ингредиентов, неизменившиеся строки не трогаются.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.authors[1]
+        self.author_client = self.client_for(self.author)
+
+    def payload(self, amount=10, ingredients=None, color='red'):
+        return {
+            'name': 'Рецепт с ингредиентами',
+            'text': 'Описание',
+            'cooking_time': 15,
+            'image': image_data_uri(color=color),
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': amount}
+                for ingredient in ingredients or self.ingredients
+            ],
+        }
+
+    def send(self, method, url, data):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.author_client, method)(
+                url, data, format='json'
+            )
+        statements = [query['sql'].split()[0] for query in context]
+        writes = [sql for sql in statements if sql in WRITES]
+        return response, len(statements), writes
+
+    def create(self, **kwargs):
+        response, total, writes = self.send(
+            'post', '/api/recipes/', self.payload(**kwargs)
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.json()['id'], total, writes
+
+    def test_create(self):
+        _, total, writes = self.create()
+
+        self.assertEqual(total, 20)
+        self.assertEqual(
+            writes, ['INSERT', 'UPDATE', 'UPDATE', 'INSERT', 'INSERT']
+        )
+        cache.clear()
+        _, total, writes = self.create(
+            ingredients=self.ingredients[:2], color='blue'
+        )
+        self.assertEqual((total, len(writes)), (20, 5))
+
+    def test_update_unchanged(self):
+        recipe_id, _, _ = self.create()
+        payload = self.payload()
+        del payload['image']
+        response, total, writes = self.send(
+            'patch', f'/api/recipes/{recipe_id}/', payload
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(total, 12)
+        self.assertEqual(writes, ['UPDATE'])
+
+    def test_update_changed(self):
+        recipe_id, _, _ = self.create()
+        payload = self.payload(amount=20)
+        del payload['image']
+        payload['ingredients'] = payload['ingredients'][2:] + [
+            {'id': self.ingredients[0].pk, 'amount': 5},
+        ]
+        response, total, writes = self.send(
+            'patch', f'/api/recipes/{recipe_id}/', payload
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(total, 15)
+        self.assertEqual(writes, ['DELETE', 'UPDATE', 'UPDATE'])
+        amounts = {
+            item['id']: item['amount']
+            for item in response.json()['ingredients']
+        }
+        self.assertEqual(len(amounts), len(self.ingredients) - 1)
+        self.assertEqual(amounts[self.ingredients[0].pk], 5)
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from api.tests.base import FoodgramTestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.relations import RELATIONS
+
+
+@mock.patch('recipes.signals.transaction.on_commit', lambda func: func())
+class RelationsCacheTest(FoodgramTestCase):
+    '''Флаги is_favorited и is_in_shopping_cart из закэшированных связей
+    меняются сразу после записи.
+    '''
+
+    def get_flags(self, recipe):
+        data = self.client.get(f'/api/recipes/{recipe.pk}/').data
+        return data['is_favorited'], data['is_in_shopping_cart']
+
+    def test_flags_follow_writes(self):
+        recipe = self.recipes[1]
+        self.assertEqual(self.get_flags(recipe), (False, False))
+
+        self.client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        self.assertEqual(self.get_flags(recipe), (True, False))
+        self.client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.assertEqual(self.get_flags(recipe), (True, True))
+
+        self.client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+        self.assertEqual(self.get_flags(recipe), (False, True))
+        self.client.delete(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        self.assertEqual(self.get_flags(recipe), (False, False))
+
+    def test_write_updates_cached_sets_in_place(self):
+        recipe = self.recipes[1]
+        self.get_flags(recipe)
+        with CaptureQueriesContext(connection) as warm:
+            self.get_flags(recipe)
+
+        self.client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_flags(recipe), (True, False))
+        self.assertEqual(len(queries), len(warm))
+
+    def test_busy_lock_invalidates_cached_sets(self):
+        recipe = self.recipes[1]
+        self.get_flags(recipe)
+        cache.add(f'{RELATIONS}:{self.user.pk}:lock', True)
+        self.client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        self.assertEqual(self.get_flags(recipe), (True, False))
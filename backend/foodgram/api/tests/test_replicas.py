@@ -0,0 +1,84 @@
+from api.replicas import REPLICA, read_from_replica, use_primary
+from api.tests.base import FoodgramTestCase
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe
+from rest_framework import status
+
+
+class ReplicaRoutingTest(FoodgramTestCase):
+    '''Реплика - второй псевдоним SQLite на соединении default: так она
+    видит данные транзакции теста, а ее запросы считаются отдельно.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        # Промах кэша токенов читает с основной БД.
+        self.client.get('/api/users/me/')
+        primary = connections[DEFAULT_DB_ALIAS]
+        primary.ensure_connection()
+        connections.databases[REPLICA] = {**primary.settings_dict}
+        connections[REPLICA].connection = primary.connection
+
+    def tearDown(self):
+        connections[REPLICA].connection = None
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        super().tearDown()
+
+    def request(self, method, url, client=None):
+        '''Ответ и число запросов к основной БД и к реплике.'''
+
+        client = client or self.client
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            with CaptureQueriesContext(connections[REPLICA]) as replica:
+                response = getattr(client, method)(url)
+        return response, len(primary), len(replica)
+
+    def test_safe_requests_read_from_replica(self):
+        response, primary, replica = self.request('get', '/api/recipes/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_unsafe_requests_use_primary(self):
+        response, primary, replica = self.request(
+            'post', f'/api/recipes/{self.recipes[1].pk}/favorite/'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_use_primary_overrides_replica(self):
+        token = read_from_replica.set(True)
+        try:
+            self.assertEqual(Recipe.objects.all().db, REPLICA)
+            with use_primary():
+                self.assertEqual(Recipe.objects.all().db, DEFAULT_DB_ALIAS)
+        finally:
+            read_from_replica.reset(token)
+
+        # Промах кэша ответов анонимов читает с основной БД.
+        _, primary, replica = self.request(
+            'get', '/api/recipes/', self.anonymous
+        )
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_sticky_cookie_pins_reads_to_primary(self):
+        response, _, _ = self.request(
+            'post', f'/api/recipes/{self.recipes[1].pk}/favorite/'
+        )
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+        response, primary, replica = self.request('get', '/api/recipes/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+        self.client.cookies[settings.REPLICA_STICKY_COOKIE] = '0'
+        _, primary, replica = self.request('get', '/api/recipes/')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
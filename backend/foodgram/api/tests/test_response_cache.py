@@ -0,0 +1,81 @@
+from pathlib import Path
+from unittest import mock
+
+from api.metrics import store
+from api.mixins import response_cache_stats
+from api.tests.base import FoodgramTestCase
+from django.conf import settings
+from recipes.models import IngredientRecipe, Recipe, Tag
+
+
+class AnonymousResponseCacheTest(FoodgramTestCase):
+    '''Ключ кэша ответов различает запросы с разными ответами.'''
+
+    def get(self, url):
+        response = self.anonymous.get(url)
+        return response['X-Cache'], response.json()
+
+    def test_parameter_order_shares_entry(self):
+        author = self.authors[0].pk
+        self.assertEqual(
+            self.get(f'/api/recipes/?author={author}&tags=tag-0')[0], 'MISS'
+        )
+        self.assertEqual(
+            self.get(f'/api/recipes/?tags=tag-0&author={author}')[0], 'HIT'
+        )
+
+    def test_blank_cursor_is_not_plain_list(self):
+        cache_status, data = self.get('/api/recipes/')
+        self.assertEqual(cache_status, 'MISS')
+        self.assertIn('count', data)
+
+        cache_status, data = self.get('/api/recipes/?cursor=')
+        self.assertEqual(cache_status, 'MISS')
+        self.assertNotIn('count', data)
+
+        cache_status, data = self.get('/api/recipes/')
+        self.assertEqual(cache_status, 'HIT')
+        self.assertIn('count', data)
+
+
+@mock.patch('recipes.signals.transaction.on_commit', lambda func: func())
+class ResponseCacheInvalidationTest(FoodgramTestCase):
+    '''Запись рецептов, их ингредиентов и тегов сбрасывает кэш
+    списка, а попадания и промахи видны в response_cache_stats.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        Path(settings.METRICS_DIR).mkdir(exist_ok=True)
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            path.unlink()
+        store.reset()
+
+    def get(self):
+        return self.anonymous.get('/api/recipes/')['X-Cache']
+
+    def test_list_is_served_from_cache(self):
+        self.assertEqual(self.get(), 'MISS')
+        self.assertEqual(self.get(), 'HIT')
+        self.assertEqual(response_cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_writes_invalidate_list(self):
+        recipe = self.recipes[0]
+        writes = {
+            'recipe': lambda: Recipe.objects.get(pk=recipe.pk).save(),
+            'ingredient': lambda: IngredientRecipe.objects.filter(
+                recipe=recipe
+            ).first().save(),
+            'recipe tags': lambda: recipe.tags.set(self.tags[1:]),
+            'tag': lambda: Tag.objects.get(pk=self.tags[0].pk).save(),
+        }
+        self.assertEqual(self.get(), 'MISS')
+        for name, write in writes.items():
+            with self.subTest(write=name):
+                self.assertEqual(self.get(), 'HIT')
+                write()
+                self.assertEqual(self.get(), 'MISS')
+        self.assertEqual(
+            response_cache_stats(),
+            {'hits': len(writes), 'misses': len(writes) + 1}
+        )
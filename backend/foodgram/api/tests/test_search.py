@@ -0,0 +1,27 @@
+from unittest import mock
+
+from api.search import search_recipes
+from api.tests.base import FoodgramTestCase
+from django.test import override_settings
+from recipes.models import Recipe
+
+
+class RecipeSearchTest(FoodgramTestCase):
+
+    @override_settings(RECIPE_SEARCH_LIMIT=8)
+    def test_index_results_are_capped(self):
+        data = self.client.get('/api/recipes/?search=рецепт&page=2').json()
+        self.assertEqual(data['count'], 8)
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNone(data['next'])
+
+    @mock.patch('api.search.is_empty_tsquery', lambda *args: True)
+    @mock.patch('api.search.uses_search_vector', lambda connection: True)
+    def test_stop_words_fall_back_to_prefix_search(self):
+        Recipe.objects.filter(pk=self.recipes[1].pk).update(
+            name='Суп с курицей'
+        )
+        self.assertEqual(
+            list(search_recipes(Recipe.objects.all(), 'С')),
+            [self.recipes[1]]
+        )
@@ -0,0 +1,46 @@
+from api.tests.base import FoodgramTestCase
+from django.db.models import F
+from recipes.models import IngredientRecipe
+from rest_framework import status
+
+URL = '/api/recipes/download_shopping_cart/?format=json'
+
+
+class ShoppingListConditionalGetTest(FoodgramTestCase):
+    '''ETag списка покупок меняется вместе с данными в БД, даже если
+    версия в кэше не изменилась: в TestCase on_commit не вызывается.
+    '''
+
+    def get(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        response = self.client.get(URL, **headers)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(
+            self.get(response['ETag']).status_code,
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_cart_change_changes_etag(self):
+        etag = self.get()['ETag']
+        self.client.post(f'/api/recipes/{self.recipes[1].pk}/shopping_cart/')
+        self.assertEqual(self.get(etag).status_code, status.HTTP_200_OK)
+
+        etag = self.get()['ETag']
+        self.client.delete(
+            f'/api/recipes/{self.recipes[1].pk}/shopping_cart/'
+        )
+        self.assertEqual(self.get(etag).status_code, status.HTTP_200_OK)
+
+    def test_amount_change_changes_etag(self):
+        etag = self.get()['ETag']
+        IngredientRecipe.objects.filter(recipe=self.recipes[0]).update(
+            amount=F('amount') + 1
+        )
+        self.assertEqual(self.get(etag).status_code, status.HTTP_200_OK)
@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+
+from api import pdf
+from api.tests.base import FoodgramTestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework import status
+
+PDF_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    SHOPPING_LIST_PDF_ROOT=PDF_ROOT,
+    SHOPPING_LIST_PDF_RENDERER='api.pdf.stub_renderer',
+    SHOPPING_LIST_PDF_WORKERS=0,
+)
+class ShoppingListPDFTests(FoodgramTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PDF_ROOT, ignore_errors=True)
+
+    def submit(self, client):
+        response = client.post('/api/recipes/download_shopping_cart_pdf/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return response.json()
+
+    def test_pdf_is_private_to_owner(self):
+        job = self.submit(self.client)
+        self.assertEqual(job['status'], pdf.DONE)
+        path = pdf.get_path(self.user.pk, job['job_id'])
+        self.assertTrue(path.exists())
+        self.assertFalse(str(path).startswith(settings.MEDIA_ROOT))
+
+        response = self.client.get(job['url'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        response.close()
+
+        other = self.client_for(self.authors[0])
+        response = other.get(job['url'])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_pending_status_is_shared(self):
+        job_id = pdf.get_job_id(self.user.pk, [])
+        pdf.set_status(self.user.pk, job_id, {'status': pdf.PENDING})
+        cache.clear()
+
+        response = self.client.get(
+            f'/api/recipes/download_shopping_cart_pdf/{job_id}/'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['status'], pdf.PENDING)
+
+    def test_stale_pending_job_is_resubmitted(self):
+        job = self.submit(self.client)
+        pdf.get_path(self.user.pk, job['job_id']).unlink()
+        pdf.set_status(self.user.pk, job['job_id'], {'status': pdf.PENDING})
+        url = f'/api/recipes/download_shopping_cart_pdf/{job["job_id"]}/'
+        self.assertEqual(
+            self.client.get(url).status_code, status.HTTP_202_ACCEPTED
+        )
+
+        with override_settings(SHOPPING_LIST_PDF_RENDER_TIMEOUT=-1):
+            response = self.client.get(url)
+            self.assertEqual(
+                response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+            self.assertEqual(response.json()['status'], pdf.FAILED)
+            self.assertEqual(self.submit(self.client)['status'], pdf.DONE)
+
+    def test_expired_pdf_is_purged(self):
+        job = self.submit(self.client)
+        path = pdf.get_path(self.user.pk, job['job_id'])
+        with override_settings(SHOPPING_LIST_PDF_TTL=-1):
+            pdf.last_purge = 0.0
+            pdf.purge_expired()
+            self.assertIsNone(pdf.get_status(self.user.pk, job['job_id']))
+        self.assertFalse(path.exists())
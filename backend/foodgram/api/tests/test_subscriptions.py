@@ -0,0 +1,66 @@
+from unittest import mock
+
+from api.tests.base import FoodgramTestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Subscription
+from rest_framework import status
+from rest_framework.pagination import PageNumberPagination
+
+
+class SubscriptionsTest(FoodgramTestCase):
+    '''Подписки: превью рецептов с recipes_limit за постоянное число
+    запросов.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        for author in self.authors[1:]:
+            Subscription.objects.create(user=self.user, author=author)
+
+    def get(self, url, expected_queries):
+        cache.clear()
+        with self.assertNumQueries(expected_queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_recipes_limit_keeps_latest_recipes(self):
+        data = self.get('/api/users/subscriptions/?recipes_limit=2', 4)
+        self.assertEqual(data['count'], len(self.authors))
+        for item in data['results']:
+            latest = [
+                recipe.pk for recipe in reversed(self.recipes)
+                if recipe.author_id == item['id']
+            ][:2]
+            self.assertEqual(
+                [recipe['id'] for recipe in item['recipes']], latest
+            )
+            self.assertEqual(item['recipes_count'], self.recipes_per_author)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for size in (1, len(self.authors)):
+            with self.subTest(size=size), mock.patch.object(
+                PageNumberPagination, 'page_size', size
+            ):
+                for query in ('', '?recipes_limit=2'):
+                    data = self.get(f'/api/users/subscriptions/{query}', 4)
+                    self.assertEqual(len(data['results']), size)
+
+    def test_ranking_is_limited_to_page_authors(self):
+        with mock.patch.object(PageNumberPagination, 'page_size', 1):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get('/api/users/subscriptions/?recipes_limit=2')
+        ranking, = [
+            query['sql'] for query in queries if 'ROW_NUMBER' in query['sql']
+        ]
+        self.assertIn(f'IN ({self.authors[0].pk})', ranking)
+
+    def test_subscribe_returns_limited_recipes(self):
+        Subscription.objects.filter(author=self.authors[2]).delete()
+        response = self.client.post(
+            f'/api/users/{self.authors[2].pk}/subscribe/?recipes_limit=1'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()['recipes']), 1)
@@ -1,6 +1,6 @@
 from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                       TagViewSet)
-from django.urls import include, path
+                       TagViewSet, metrics)
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
@@ -11,6 +11,7 @@ router.register('users', CustomUserViewSet)
 
 
 urlpatterns = [
+    re_path(r'^metrics/?$', metrics, name='metrics'),
     path('', include(router.urls)),
     path('', include('users.urls')),
 ]
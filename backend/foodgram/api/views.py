@@ -1,40 +1,93 @@
-from api import serializers
+from hashlib import md5
+
+from api import pdf, serializers
 from api.filters import RecipeFilter, SearchIngredient
+from api.instrumentation import InstrumentedViewMixin
+from api.metrics import render_metrics
+from api.mixins import AnonymousResponseCacheMixin, PrerenderedListMixin
+from api.pagination import FeedPagination, RecipePagination
 from api.permissions import IsAuthorOrReadOnly
+from api.renderers import (ShoppingListCSVRenderer, ShoppingListJSONRenderer,
+                           ShoppingListTextRenderer)
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import IntegrityError
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import (Count, F, Max, Prefetch, Sum, Window,
+                              prefetch_related_objects)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseForbidden, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
+from recipes.feeds import feed_sources
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                             ShoppingCart, Subscription, Tag)
+from recipes.versions import (INGREDIENTS, RECIPES, SHOPPING_CART, TAGS,
+                              get_version, user_version_name)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(InstrumentedViewMixin, UserViewSet):
     '''Расширенный пользовательский вьюсет.'''
 
     queryset = User.objects.all()
     serializer_class = serializers.CustomUserSerializer
 
+    def get_subscriptions_queryset(self, user):
+        return Subscription.objects.filter(user=user).select_related(
+            'author'
+        ).order_by('pk')
+
+    def prefetch_preview_recipes(self, subscriptions):
+        '''Превью последних рецептов авторов из subscriptions одним
+        запросом. С recipes_limit рецепты нумеруются оконной функцией
+        только у этих авторов, а не у всех, на кого подписан польз-ль.
+        '''
+
+        recipes = Recipe.objects.all()
+        limit = self.request.query_params.get('recipes_limit')
+        if limit and limit.isdigit():
+            ranked = Recipe.objects.filter(author__in={
+                subscription.author_id for subscription in subscriptions
+            }).annotate(
+                author_position=Window(
+                    expression=RowNumber(),
+                    partition_by=F('author'),
+                    order_by=(F('pub_date').desc(), F('id').desc())
+                )
+            ).values('id', 'author_position').order_by()
+            sql, params = ranked.query.sql_with_params()
+            recipes = recipes.filter(id__in=RawSQL(
+                f'SELECT ranked.id FROM ({sql}) AS ranked '
+                f'WHERE ranked.author_position <= %s',
+                (*params, int(limit))
+            ))
+        prefetch_related_objects(subscriptions, Prefetch(
+            'author__recipes', queryset=recipes, to_attr='preview_recipes'
+        ))
+        return subscriptions
+
     @action(detail=False, permission_classes=(IsAuthenticated, ),)
     def subscriptions(self, request):
         '''Получение списка подписок текущего пользователя.'''
 
         user = request.user
-        queryset = Subscription.objects.filter(user=user)
-        pages = self.paginate_queryset(queryset)
-        serializer = serializers.SubscriptionSerializer(
+        queryset = self.get_subscriptions_queryset(user)
+        pages = self.prefetch_preview_recipes(self.paginate_queryset(queryset))
+        serializer = self.instrument(serializers.SubscriptionSerializer(
             pages, many=True, context={'request': request}
-        )
+        ))
         return self.get_paginated_response(serializer.data)
 
     @action(
@@ -56,17 +109,21 @@ class CustomUserViewSet(UserViewSet):
 
         if request.method == 'POST':
             try:
-                subscribe = Subscription.objects.create(
-                    user=user, author=author)
+                with transaction.atomic():
+                    subscribe = Subscription.objects.create(
+                        user=user, author=author)
             except IntegrityError:
                 return Response(
                     {'errors': 'Вы уже подписались на автора!'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            subscribe, = self.prefetch_preview_recipes([
+                self.get_subscriptions_queryset(user).get(pk=subscribe.pk)
+            ])
 
-            serializer = serializers.SubscriptionSerializer(
+            serializer = self.instrument(serializers.SubscriptionSerializer(
                 subscribe, context={'request': request}
-            )
+            ))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
@@ -84,26 +141,43 @@ class CustomUserViewSet(UserViewSet):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(InstrumentedViewMixin, PrerenderedListMixin,
+                        viewsets.ReadOnlyModelViewSet):
     '''Ингредиенты.'''
 
+    version_name = INGREDIENTS
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     filter_backends = (SearchIngredient,)
-    search_fields = ('^name', )
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(InstrumentedViewMixin, AnonymousResponseCacheMixin,
+                    viewsets.ModelViewSet):
     '''Рецепты.'''
 
+    version_names = (RECIPES, INGREDIENTS)
     queryset = Recipe.objects.all()
     serializer_class = serializers.RecipeSerializer
     http_method_names = ['get', 'post', 'patch', 'delete']
     permission_classes = (IsAuthorOrReadOnly, )
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
+
+    def get_queryset(self):
+        '''Рецепты вместе с тегами и ингредиентами, чтобы число запросов
+        не зависело от размера страницы.
+        '''
+
+        return Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipes',
+                queryset=IngredientRecipe.objects.select_related('ingredient')
+            )
+        )
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -116,6 +190,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.pagination_class()
         return None
 
+    def get_feed_sources(self):
+        return feed_sources(self.request.user)
+
+    @action(detail=False, permission_classes=(IsAuthenticated, ))
+    def feed(self, request):
+        '''Рецепты авторов, на которых подписан польз-ль, от новых
+        к старым, с пагинацией по ключу.
+        '''
+
+        paginator = FeedPagination()
+        page = paginator.paginate_queryset(
+            self.get_queryset(), request, view=self
+        )
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=('post', 'delete'),
@@ -129,17 +219,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if request.method == 'POST':
             try:
-                favorite = Favorite.objects.create(
-                    user=user, recipe=recipe)
+                with transaction.atomic():
+                    favorite = Favorite.objects.create(
+                        user=user, recipe=recipe)
             except IntegrityError:
                 return Response(
                     {'errors': 'Этот рецепт уже добавлен в избранное!'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            serializer = serializers.FavoriteSerializer(
+            serializer = self.instrument(serializers.FavoriteSerializer(
                 favorite, context={'request': request}
-            )
+            ))
             return Response(
                 serializer.data,
                 status=status.HTTP_201_CREATED
@@ -172,17 +263,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if request.method == 'POST':
             try:
-                shopping_cart = ShoppingCart.objects.create(
-                    user=user, recipe=recipe)
+                with transaction.atomic():
+                    shopping_cart = ShoppingCart.objects.create(
+                        user=user, recipe=recipe)
             except IntegrityError:
                 return Response(
                     {'errors': 'Этот рецепт уже добавлен в список покупок!'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            serializer = serializers.ShoppingCartSerializer(
+            serializer = self.instrument(serializers.ShoppingCartSerializer(
                 shopping_cart, context={'request': request}
-            )
+            ))
             return Response(
                 serializer.data,
                 status=status.HTTP_201_CREATED
@@ -202,35 +294,155 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
-    @action(detail=False, permission_classes=(IsAuthenticated, ))
-    def download_shopping_cart(self, request):
-        '''Загрузить список покупок в txt.'''
+    def get_shopping_list(self, user):
+        '''Суммарное количество ингредиентов из списка покупок польз-ля.'''
 
-        ingredients = (
+        return (
             IngredientRecipe.objects
-            .filter(recipe__shopping_carts__user=request.user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
+            .filter(recipe__shopping_carts__user=user)
+            .values(
+                name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit')
+            )
             .annotate(amount=Sum('amount'))
-            .order_by()
+            .order_by('name')
+        )
+
+    def get_shopping_list_fingerprint(self, user):
+        '''Отпечаток списка покупок по БД: число и последний id записей
+        списка и строк ингредиентов их рецептов, сумма количеств.
+        '''
+
+        return ShoppingCart.objects.filter(user=user).aggregate(
+            carts=Count('pk', distinct=True),
+            last_cart=Max('pk'),
+            rows=Count('recipe__recipes', distinct=True),
+            last_row=Max('recipe__recipes'),
+            total=Sum('recipe__recipes__amount'),
+        )
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated, ),
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListJSONRenderer,
+        )
+    )
+    def download_shopping_cart(self, request):
+        '''Загрузить список покупок в txt, csv или json (?format=).
+
+        ETag строится по версиям и отпечатку списка из БД, поэтому не
+        совпадет после изменения списка, даже если версия в кэше еще
+        старая. Last-Modified не отдается: с точностью до секунды он
+        не различает изменения внутри одной секунды.
+        '''
+
+        renderer = request.accepted_renderer
+        versions = [
+            get_version(user_version_name(SHOPPING_CART, request.user.pk)),
+            get_version(RECIPES),
+            get_version(INGREDIENTS),
+        ]
+        fingerprint = self.get_shopping_list_fingerprint(request.user)
+        etag = md5(':'.join(map(str, [
+            renderer.format, *versions, *fingerprint.values()
+        ])).encode()).hexdigest()
+
+        ingredients = self.get_shopping_list(request.user)
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator()),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        list_file = f'shop_list.{renderer.format}'
+        response['Content-Disposition'] = f'attachment; filename={list_file}'
+        response['ETag'] = f'"{etag}"'
+        return get_conditional_response(
+            request, etag=f'"{etag}"', response=response
         )
 
-        shop_list = []
-        shop_list.append('Список покупок: \n')
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            measurement_unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['amount']
-            shop_list.append(f'\n{name} - {amount} {measurement_unit}')
-        response = HttpResponse(shop_list, content_type='text/plain')
-        list_txt = 'shop_list.txt'
-        response['Content-Disposition'] = f'attachment; filename={list_txt}'
-        return response
+    @action(
+        detail=False,
+        methods=('post', ),
+        permission_classes=(IsAuthenticated, )
+    )
+    def download_shopping_cart_pdf(self, request):
+        '''Запуск фонового рендеринга списка покупок в PDF.'''
+
+        job_id, job_status = pdf.submit(
+            request.user.pk, list(self.get_shopping_list(request.user))
+        )
+        url = reverse(
+            'recipe-download-shopping-cart-pdf-job',
+            kwargs={'job_id': job_id},
+            request=request
+        )
+        return Response(
+            {'job_id': job_id, 'url': url, **job_status},
+            status=status.HTTP_202_ACCEPTED
+        )
 
+    @action(
+        detail=False,
+        url_path=r'download_shopping_cart_pdf/(?P<job_id>[0-9a-f]{64})',
+        permission_classes=(IsAuthenticated, )
+    )
+    def download_shopping_cart_pdf_job(self, request, job_id=None):
+        '''Статус рендеринга PDF, готовый файл - когда рендеринг завершен.'''
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+        job_status = pdf.get_status(request.user.pk, job_id)
+        if job_status is None:
+            return Response(
+                {'errors': 'Задача не найдена.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if job_status['status'] == pdf.DONE:
+            return FileResponse(
+                open(pdf.get_path(request.user.pk, job_id), 'rb'),
+                as_attachment=True,
+                filename='shop_list.pdf',
+                content_type='application/pdf'
+            )
+        if job_status['status'] == pdf.FAILED:
+            return Response(
+                {'job_id': job_id, **job_status},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return Response(
+            {'job_id': job_id, **job_status},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class TagViewSet(InstrumentedViewMixin, PrerenderedListMixin,
+                 viewsets.ReadOnlyModelViewSet):
     '''Теги.'''
 
+    version_name = TAGS
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
+
+
+def metrics(request):
+    '''Метрики всех процессов в текстовом формате Prometheus.
+
+    Нужен заголовок Authorization: Bearer <METRICS_TOKEN>. Без
+    METRICS_TOKEN эндпоинт доступен только при DEBUG.
+    '''
+
+    request.handler_name = 'metrics'
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            raise Http404
+    elif not constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render_metrics(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -36,6 +37,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.RequestTimingMiddleware',
+    'api.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,6 +80,38 @@ DATABASES = {
     }
 }
 
+# Реплика для чтения включается, если задан REPLICA_DB_HOST или
+# REPLICA_DB_NAME, остальные параметры берутся из основной БД.
+if os.getenv('REPLICA_DB_HOST') or os.getenv('REPLICA_DB_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv(
+            'REPLICA_DB_NAME', default=DATABASES['default']['NAME']
+        ),
+        'HOST': os.getenv(
+            'REPLICA_DB_HOST', default=DATABASES['default']['HOST']
+        ),
+        'PORT': os.getenv(
+            'REPLICA_DB_PORT', default=DATABASES['default']['PORT']
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', default=15))
+REPLICA_STICKY_COOKIE = 'use_primary'
+
+# Кэш общий для всех процессов: в нем версии наборов данных, связи
+# польз-лей и токены, изменения которых должны видеть все воркеры.
+# По умолчанию - таблица в БД (manage.py createcachetable), в
+# infra/docker-compose.yml - memcached. LocMemCache допустим только
+# с одним воркером gunicorn, см. gunicorn.conf.py.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram_cache'),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -111,9 +146,13 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # User
 AUTH_USER_MODEL = 'users.CustomUser'
 
+AUTH_TOKEN_CACHE_TIMEOUT = int(
+    os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', default=300)
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PERMISSION_CLASSES': [
@@ -140,4 +179,55 @@ DJOSER = {
     'HIDE_USERS': False,
 }
 
+# Ingredients
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=50))
+
+# Recipes
+# Без PostgreSQL поиск рецептов отдает столько самых релевантных.
+RECIPE_SEARCH_LIMIT = int(os.getenv('RECIPE_SEARCH_LIMIT', default=500))
+
+# Recipe images
+RECIPE_IMAGE_WIDTHS = (480, 960)
+RECIPE_IMAGE_MAX_ENCODED_BYTES = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_DIMENSION = 6000
+RECIPE_IMAGE_MAX_PIXELS = 24_000_000
+
+# Shopping list PDF
+SHOPPING_LIST_PDF_RENDERER = os.getenv(
+    'SHOPPING_LIST_PDF_RENDERER', default='api.pdf.pdfkit_renderer'
+)
+SHOPPING_LIST_PDF_WORKERS = int(os.getenv('SHOPPING_LIST_PDF_WORKERS', default=2))
+# Вне MEDIA_ROOT: nginx раздает /media/ всем.
+SHOPPING_LIST_PDF_ROOT = os.getenv(
+    'SHOPPING_LIST_PDF_ROOT',
+    default=os.path.join(BASE_DIR, 'private', 'shopping_lists')
+)
+SHOPPING_LIST_PDF_TTL = int(os.getenv('SHOPPING_LIST_PDF_TTL', default=60 * 60))
+# Метка pending старше этого времени осталась от умершего процесса.
+SHOPPING_LIST_PDF_RENDER_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_PDF_RENDER_TIMEOUT', default=2 * 60)
+)
+
+# Request timing
+REQUEST_TIMING_SAMPLE_RATE = float(
+    os.getenv('REQUEST_TIMING_SAMPLE_RATE', default=0.05)
+)
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', default=500))
+SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', default=30))
+SLOW_REQUEST_TOP_STATEMENTS = 5
+
+# Metrics
+METRICS_DIR = os.getenv(
+    'METRICS_DIR',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram-metrics')
+)
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', default=5))
+# Без токена /api/metrics/ отвечает 404, если не включен DEBUG.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+# Subscription feed
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', default=10000))
+FEED_BACKFILL = int(os.getenv('FEED_BACKFILL', default=100))
+FEED_MAX_ENTRIES = int(os.getenv('FEED_MAX_ENTRIES', default=1000))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
@@ -1,7 +1,11 @@
 import os
 
+from api.metrics import store
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+# Метрики в METRICS_DIR пишут только процессы веб-сервера.
+store.enable()
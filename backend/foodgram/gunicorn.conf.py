@@ -0,0 +1,10 @@
+import os
+
+
+def on_starting(server):
+    '''Не запускает несколько воркеров с кэшем, видным только одному.'''
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from recipes.versions import check_shared_cache
+
+    check_shared_cache(server.cfg.workers)
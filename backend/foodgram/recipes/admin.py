@@ -7,9 +7,9 @@ from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
 class FavoriteAdmin(admin.ModelAdmin):
 
     list_display = ('user', 'recipe', )
-    list_filter = ('user', )
-    search_fields = ('recipe__name', )
-    search_help_text = 'Название рецепта'
+    list_select_related = ('user', 'recipe', )
+    autocomplete_fields = ('user', 'recipe', )
+    search_fields = ('recipe__name', 'user__email', 'user__username', )
 
 
 @admin.register(Ingredient)
@@ -18,7 +18,6 @@ class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit', )
     list_filter = ('measurement_unit', )
     search_fields = ('name', )
-    search_help_text = 'NAME'
     list_per_page = 50
 
 
@@ -27,41 +26,51 @@ class TagAdmin(admin.ModelAdmin):
 
     list_display = ('slug', )
     search_fields = ('slug', )
-    search_help_text = 'SLUG тега'
 
 
 class IngredientRecipeAdminInline(admin.TabularInline):
     '''Инлайн для связанной модели IngredientRecipe.'''
 
     model = IngredientRecipe
+    autocomplete_fields = ('ingredient', )
+    extra = 1
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'ingredient', 'recipe'
+        )
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
 
-    readonly_fields = ('favorites', )
-    list_display = ('name', 'author', 'favorites')
-    list_filter = ('author', 'tags', )
-    search_fields = ('name', 'tags__name')
-    search_help_text = 'NAME'
+    readonly_fields = ('favorites_count', 'in_carts_count')
+    list_display = ('name', 'author', 'favorites_count')
+    list_select_related = ('author', )
+    list_filter = ('tags', )
+    autocomplete_fields = ('author', )
+    search_fields = (
+        'name', 'tags__name', 'author__email', 'author__username',
+    )
     list_per_page = 50
     inlines = [IngredientRecipeAdminInline, ]
 
-    def favorites(self, obj):
-        return obj.favorites.count()
-
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
 
     list_display = ('user', 'recipe', )
-    list_filter = ('user', )
-    search_fields = ('recipe__name', )
-    search_help_text = 'Название рецепта'
+    list_select_related = ('user', 'recipe', )
+    autocomplete_fields = ('user', 'recipe', )
+    search_fields = ('recipe__name', 'user__email', 'user__username', )
 
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
 
     list_display = ('user', 'author', )
-    list_filter = ('user', 'author', )
+    list_select_related = ('user', 'author', )
+    autocomplete_fields = ('user', 'author', )
+    search_fields = (
+        'user__email', 'user__username', 'author__email', 'author__username',
+    )
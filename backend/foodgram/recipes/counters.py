@@ -0,0 +1,57 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# (модель, поле-счетчик, связанная модель, поле связи с моделью)
+COUNTERS = (
+    ('recipes.Recipe', 'favorites_count', 'recipes.Favorite', 'recipe'),
+    ('recipes.Recipe', 'in_carts_count', 'recipes.ShoppingCart', 'recipe'),
+    ('users.CustomUser', 'recipes_count', 'recipes.Recipe', 'author'),
+    ('users.CustomUser', 'followers_count', 'recipes.Subscription', 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    '''Меняет счетчик на delta одним UPDATE с F(), не уходя ниже нуля.'''
+
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def count_related(related_model, related_field):
+    '''Подзапрос с количеством связанных записей для OuterRef('pk').'''
+
+    return Coalesce(
+        Subquery(
+            related_model.objects
+            .filter(**{related_field: OuterRef('pk')})
+            .order_by()
+            .values(related_field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0
+    )
+
+
+def recount(get_model):
+    '''Пересчитывает счетчики, разошедшиеся с реальным количеством
+    связанных записей. get_model - apps.get_model приложения или миграции.
+
+    Возвращает {'<модель>.<счетчик>': количество исправленных строк}.
+    '''
+
+    fixed = {}
+    for label, field, related_label, related_field in COUNTERS:
+        model = get_model(label)
+        actual = count_related(get_model(related_label), related_field)
+        drifted = list(
+            model.objects
+            .annotate(actual_count=actual)
+            .exclude(**{field: F('actual_count')})
+            .values_list('pk', flat=True)
+        )
+        model.objects.filter(pk__in=drifted).update(**{field: actual})
+        fixed[f'{label}.{field}'] = len(drifted)
+    return fixed
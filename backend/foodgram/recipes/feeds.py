@@ -0,0 +1,188 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
+from recipes.models import FeedEntry, Recipe, Subscription
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+
+
+def is_popular(author_id):
+    '''Рецепты популярных авторов не раскладываются по лентам
+    подписчиков, а читаются при запросе ленты.
+    '''
+
+    return User.objects.filter(
+        pk=author_id, followers_count__gte=settings.FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def latest_recipe_ids(recipe_model, author_id):
+    return list(
+        recipe_model.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('pk', flat=True)[:settings.FEED_BACKFILL]
+    )
+
+
+def fan_out(recipe):
+    '''Добавляет новый рецепт в ленты подписчиков автора.
+
+    Ленты здесь не обрезаются: проверка всех подписчиков замедлила бы
+    каждую публикацию. Лишние записи удаляет периодический запуск
+    rebuild_feeds --trim.
+    '''
+
+    if is_popular(recipe.author_id):
+        return
+    followers = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe=recipe) for user_id in followers),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill(user_id, author_id):
+    '''При подписке добавляет в ленту последние FEED_BACKFILL рецептов
+    автора и обрезает ленту до FEED_MAX_ENTRIES.
+    '''
+
+    if is_popular(author_id):
+        return
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id)
+            for recipe_id in latest_recipe_ids(Recipe, author_id)
+        ),
+        ignore_conflicts=True
+    )
+    trim(FeedEntry, user_id)
+
+
+def remove(user_id, author_id):
+    '''При отписке убирает рецепты автора из ленты польз-ля.
+
+    Если из-за отписки автор перестал быть популярным, его последние
+    рецепты раскладываются по лентам остальных подписчиков: пока он был
+    популярным, новые рецепты в ленты не попадали. Счетчик уже уменьшен
+    в этой транзакции, поэтому переход через FEED_FANOUT_LIMIT видит
+    только одна из одновременных отписок.
+    '''
+
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+    if User.objects.filter(
+        pk=author_id, followers_count=settings.FEED_FANOUT_LIMIT - 1
+    ).exists():
+        backfill_followers(author_id)
+
+
+def backfill_followers(author_id):
+    recipe_ids = latest_recipe_ids(Recipe, author_id)
+    followers = list(
+        Subscription.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id)
+            for user_id in followers
+            for recipe_id in recipe_ids
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    trim_overfull(
+        FeedEntry,
+        Subscription.objects.filter(author_id=author_id).values('user_id')
+    )
+
+
+def trim(feed_model, user_id):
+    '''Удаляет из ленты записи старше FEED_MAX_ENTRIES последних.'''
+
+    limit = settings.FEED_MAX_ENTRIES
+    cutoff = list(
+        feed_model.objects.filter(user_id=user_id)
+        .order_by('-recipe__pub_date', '-recipe_id')
+        .values_list('recipe__pub_date', 'recipe_id')[limit:limit + 1]
+    )
+    if not cutoff:
+        return
+    pub_date, recipe_id = cutoff[0]
+    feed_model.objects.filter(user_id=user_id).filter(
+        Q(recipe__pub_date__lt=pub_date)
+        | Q(recipe__pub_date=pub_date, recipe_id__lte=recipe_id)
+    ).delete()
+
+
+def trim_overfull(feed_model, user_ids=None):
+    '''Обрезает ленты польз-лей user_ids (по умолчанию всех), в которых
+    больше FEED_MAX_ENTRIES записей. Возвращает число обрезанных лент.
+    '''
+
+    entries = feed_model.objects.all()
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    overfull = list(
+        entries.values('user_id').annotate(entries=Count('pk'))
+        .filter(entries__gt=settings.FEED_MAX_ENTRIES)
+        .values_list('user_id', flat=True).order_by()
+    )
+    for user_id in overfull:
+        trim(feed_model, user_id)
+    return len(overfull)
+
+
+def feed_sources(user):
+    '''Выборки рецептов ленты польз-ля: материализованная лента и
+    рецепты популярных авторов, на которых он подписан.
+    '''
+
+    sources = [Recipe.objects.filter(feed_entries__user=user)]
+    popular = list(
+        Subscription.objects.filter(
+            user=user,
+            author__followers_count__gte=settings.FEED_FANOUT_LIMIT
+        ).values_list('author_id', flat=True)
+    )
+    if popular:
+        sources.append(Recipe.objects.filter(author_id__in=popular))
+    return sources
+
+
+def rebuild(get_model):
+    '''Заново строит все ленты из подписок, возвращает число записей.
+
+    Нужна после массовой загрузки данных в обход сигналов и чтобы
+    вернуть в ленты рецепты автора, который перестал быть популярным.
+    '''
+
+    feed_model = get_model('recipes', 'FeedEntry')
+    recipe_model = get_model('recipes', 'Recipe')
+    subscription_model = get_model('recipes', 'Subscription')
+
+    feed_model.objects.all().delete()
+    authors = subscription_model.objects.filter(
+        author__followers_count__lt=settings.FEED_FANOUT_LIMIT
+    ).values_list('author_id', flat=True).distinct().order_by()
+    for author_id in list(authors):
+        recipe_ids = latest_recipe_ids(recipe_model, author_id)
+        followers = subscription_model.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        feed_model.objects.bulk_create(
+            (
+                feed_model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in followers
+                for recipe_id in recipe_ids
+            ),
+            batch_size=BATCH_SIZE
+        )
+    trim_overfull(feed_model)
+    return feed_model.objects.count()
@@ -0,0 +1,79 @@
+import logging
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+SOURCE = 'source'
+
+
+def derivative_key(width, extension):
+    return f'{width}.{extension}'
+
+
+THUMBNAIL = derivative_key(settings.RECIPE_IMAGE_WIDTHS[0], 'jpeg')
+
+
+def convert(image, image_format):
+    '''Приводит цветовую модель к поддерживаемой форматом,
+    прозрачный фон для JPEG заменяется белым.
+    '''
+
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA')
+    return image
+
+
+def build_derivatives(image_field):
+    '''Создает уменьшенные копии картинки рецепта в WebP и JPEG
+    для каждой ширины из RECIPE_IMAGE_WIDTHS.
+
+    Возвращает словарь {'<ширина>.<формат>': имя файла, 'source': имя
+    исходника} или пустой словарь, если исходник не удалось прочитать.
+    '''
+
+    storage = image_field.storage
+    name = PurePosixPath(image_field.name)
+    directory = PurePosixPath(image_field.field.upload_to) / 'derivatives'
+    try:
+        with storage.open(image_field.name, 'rb') as f:
+            original = Image.open(f)
+            original.load()
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('Не удалось прочитать картинку %s', image_field.name)
+        return {}
+
+    derivatives = {SOURCE: image_field.name}
+    for width in settings.RECIPE_IMAGE_WIDTHS:
+        resized = original.copy()
+        resized.thumbnail((width, width * 4), Image.LANCZOS)
+        for extension, (image_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            convert(resized, image_format).save(
+                buffer, image_format, **options
+            )
+            key = derivative_key(width, extension)
+            derivatives[key] = storage.save(
+                str(directory / f'{name.stem}_{key}'),
+                ContentFile(buffer.getvalue())
+            )
+    return derivatives
+
+
+def needs_derivatives(recipe):
+    return bool(recipe.image) and (
+        recipe.image_derivatives.get(SOURCE) != recipe.image.name
+    )
@@ -1,20 +1,133 @@
 import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 from recipes.models import Ingredient
+from recipes.versions import INGREDIENTS, bump_version
+
+DEFAULT_PATH = Path(settings.BASE_DIR).parent.parent / 'data/ingredients.csv'
+HEADER = ('name', 'measurement_unit')
 
 
 class Command(BaseCommand):
-    help = 'Добавляет ingredients.csv в БД'
+    help = (
+        'Загружает ингредиенты из CSV или JSON в БД пакетами. '
+        'Повторный запуск не создает дубликатов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=str(DEFAULT_PATH),
+            help='Путь к ingredients.csv или ingredients.json'
+        )
+        parser.add_argument(
+            '--format', choices=('csv', 'json'),
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк в одном пакете'
+        )
 
     def handle(self, *args, **options):
-        with open(
-            '/home/stas/Dev/foodgram-project-react/data/ingredients.csv'
-        ) as f:
-            reader = csv.reader(f, delimiter=',')
-            next(reader, None)
-            for row in reader:
-                _, created = Ingredient.objects.get_or_create(
-                    name=row[0],
-                    measurement_unit=row[1]
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'Файл {path} не найден.')
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ('csv', 'json'):
+            raise CommandError(f'Неизвестный формат файла: {path.name}')
+
+        read = self.read_csv if file_format == 'csv' else self.read_json
+        started = time.monotonic()
+        with open(path, encoding='utf-8') as f:
+            rows = read(f)
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    total, created = self.copy_rows(
+                        rows, options['batch_size']
+                    )
+                else:
+                    total, created = self.bulk_create_rows(
+                        rows, options['batch_size']
+                    )
+        if created:
+            bump_version(INGREDIENTS)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {total}, добавлено ингредиентов: {created} '
+            f'за {elapsed:.2f} с ({total / max(elapsed, 1e-6):.0f} строк/с).'
+        ))
+
+    def read_csv(self, f):
+        for row in csv.reader(f):
+            if len(row) < 2 or tuple(row[:2]) == HEADER:
+                continue
+            yield row[0].strip(), row[1].strip()
+
+    def read_json(self, f):
+        for item in json.load(f):
+            yield item['name'].strip(), item['measurement_unit'].strip()
+
+    def batches(self, rows, batch_size):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def bulk_create_rows(self, rows, batch_size):
+        '''Пакетная вставка через ORM, конфликты с уникальным
+        ограничением (name, measurement_unit) пропускаются.
+        '''
+
+        total = 0
+        before = Ingredient.objects.count()
+        for batch in self.batches(rows, batch_size):
+            total += len(batch)
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ),
+                ignore_conflicts=True
+            )
+        return total, Ingredient.objects.count() - before
+
+    def copy_rows(self, rows, batch_size):
+        '''PostgreSQL: COPY во временную таблицу и одна вставка
+        с ON CONFLICT DO NOTHING в таблицу ингредиентов.
+        '''
+
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP'
+            )
+            for batch in self.batches(rows, batch_size):
+                total += len(batch)
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_import (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    buffer
                 )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT DISTINCT name, measurement_unit '
+                f'FROM ingredient_import '
+                f'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            return total, cursor.rowcount
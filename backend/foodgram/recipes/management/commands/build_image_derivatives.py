@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from recipes.images import build_derivatives, needs_derivatives
+from recipes.models import Recipe
+from recipes.versions import RECIPES, bump_version
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии картинок уже загруженных рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать копии, даже если они уже есть'
+        )
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        recipes = Recipe.objects.only('id', 'image', 'image_derivatives')
+        for recipe in recipes.iterator():
+            if not recipe.image:
+                continue
+            if not options['force'] and not needs_derivatives(recipe):
+                continue
+            derivatives = build_derivatives(recipe.image)
+            if not derivatives:
+                failed += 1
+                continue
+            Recipe.objects.filter(pk=recipe.pk).update(
+                image_derivatives=derivatives
+            )
+            built += 1
+        if built:
+            bump_version(RECIPES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {built}, с ошибками: {failed}.'
+        ))
@@ -0,0 +1,84 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки рецептов и их уменьшенные копии, '
+        'на которые не ссылается ни один рецепт'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько места можно освободить'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество файлов, удаляемых за один проход'
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Не трогать файлы моложе указанного числа секунд: '
+                 'они могут принадлежать еще не сохраненному рецепту'
+        )
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        storage = field.storage
+        referenced = self.get_referenced()
+        threshold = timezone.now() - timedelta(seconds=options['min_age'])
+
+        orphans = []
+        reclaimable = 0
+        for name in self.walk(storage, field.upload_to.rstrip('/')):
+            if name in referenced:
+                continue
+            if storage.get_modified_time(name) > threshold:
+                continue
+            orphans.append(name)
+            reclaimable += storage.size(name)
+
+        if options['dry_run']:
+            for name in orphans:
+                self.stdout.write(name)
+            self.stdout.write(self.style.SUCCESS(
+                f'Можно удалить файлов: {len(orphans)}, '
+                f'освободится {reclaimable / 2 ** 20:.1f} МБ.'
+            ))
+            return
+
+        batch_size = options['batch_size']
+        for start in range(0, len(orphans), batch_size):
+            for name in orphans[start:start + batch_size]:
+                # Повторная загрузка того же содержимого обновляет время
+                # изменения: такой файл снова может быть нужен рецепту.
+                if storage.get_modified_time(name) <= threshold:
+                    storage.delete(name)
+            self.stdout.write(
+                f'Удалено {min(start + batch_size, len(orphans))} '
+                f'из {len(orphans)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {len(orphans)}, '
+            f'освобождено {reclaimable / 2 ** 20:.1f} МБ.'
+        ))
+
+    def get_referenced(self):
+        referenced = set()
+        rows = Recipe.objects.values_list('image', 'image_derivatives')
+        for image, derivatives in rows.iterator():
+            referenced.add(image)
+            referenced.update(derivatives.values())
+        return referenced
+
+    def walk(self, storage, path):
+        directories, files = storage.listdir(path)
+        for name in files:
+            yield posixpath.join(path, name)
+        for directory in directories:
+            yield from self.walk(storage, posixpath.join(path, directory))
@@ -0,0 +1,268 @@
+import math
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate, islice
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+from recipes.counters import recount
+from recipes.feeds import rebuild
+from recipes.images import build_derivatives
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Subscription, Tag)
+from recipes.search import search_vector, uses_search_vector
+from recipes.versions import RECIPES, TAGS, bump_version
+
+User = get_user_model()
+
+ADJECTIVES = (
+    'Домашний', 'Быстрый', 'Пряный', 'Летний', 'Сырный', 'Запеченный',
+    'Острый', 'Нежный', 'Деревенский', 'Праздничный', 'Постный', 'Сливочный',
+)
+DISHES = (
+    'суп', 'салат', 'пирог', 'плов', 'омлет', 'рагу', 'борщ', 'гуляш',
+    'ризотто', 'жаркое', 'рулет', 'запеканка', 'соус', 'пирожок', 'крем',
+)
+WORDS = (
+    'нарезать', 'обжарить', 'добавить', 'посолить', 'перемешать', 'духовке',
+    'сковороде', 'минут', 'огне', 'подавать', 'зеленью', 'чесноком',
+    'курицей', 'грибами', 'картофелем', 'сметаной', 'сыром', 'тестом',
+    'овощами', 'специями', 'лимоном', 'маслом', 'горячим', 'холодным',
+)
+RECIPE_SPAN = timedelta(days=730)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def zipf_weights(size, exponent):
+    '''Накопленные веса распределения Ципфа для random.choices.'''
+
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД синтетическими польз-лями, рецептами, избранным, '
+        'списками покупок и подписками с неравномерным распределением'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument(
+            '--favorites', type=float, default=20,
+            help='Среднее число рецептов в избранном у польз-ля'
+        )
+        parser.add_argument(
+            '--carts', type=float, default=3,
+            help='Среднее число рецептов в списке покупок у польз-ля'
+        )
+        parser.add_argument(
+            '--subscriptions', type=float, default=5,
+            help='Среднее число подписок у польз-ля'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель распределения Ципфа для популярности '
+                 'авторов и рецептов'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        self.ingredient_ids = list(
+            Ingredient.objects.values_list('pk', flat=True)
+        )
+        if not self.ingredient_ids:
+            raise CommandError(
+                'Нет ингредиентов, сначала выполните add_ingredients.'
+            )
+
+        with transaction.atomic():
+            tag_ids = self.stage('Теги', self.create_tags)
+            user_ids = self.stage('Пользователи', self.create_users)
+            author_weights = zipf_weights(len(user_ids), options['skew'])
+            self.random.shuffle(user_ids)
+            recipe_ids = self.stage(
+                'Рецепты', self.create_recipes, user_ids, author_weights
+            )
+            self.stage('Теги и ингредиенты рецептов', self.create_links,
+                       recipe_ids, tag_ids)
+            recipe_weights = zipf_weights(len(recipe_ids), options['skew'])
+            self.random.shuffle(recipe_ids)
+            self.stage('Избранное', self.create_relations, Favorite,
+                       'recipe_id', user_ids, recipe_ids, recipe_weights,
+                       options['favorites'])
+            self.stage('Списки покупок', self.create_relations, ShoppingCart,
+                       'recipe_id', user_ids, recipe_ids, recipe_weights,
+                       options['carts'])
+            self.stage('Подписки', self.create_relations, Subscription,
+                       'author_id', user_ids, user_ids, author_weights,
+                       options['subscriptions'])
+            if uses_search_vector(connection):
+                self.stage('Поисковые векторы', lambda: Recipe.objects.filter(
+                    pk__in=recipe_ids
+                ).update(search_vector=search_vector()))
+            self.stage('Счетчики', recount, apps.get_model)
+            self.stage('Ленты подписок', rebuild, apps.get_model)
+        bump_version(TAGS)
+        bump_version(RECIPES)
+
+    def stage(self, title, function, *args):
+        started = time.monotonic()
+        try:
+            return function(*args)
+        finally:
+            self.stdout.write(
+                f'{title}: {time.monotonic() - started:.1f} с'
+            )
+
+    def insert(self, model, objects):
+        '''Вставляет объекты пакетами и возвращает id новых строк.'''
+
+        last_id = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        for batch in chunked(objects, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+        return list(
+            model.objects.filter(pk__gt=last_id)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def create_tags(self):
+        existing = Tag.objects.count()
+        self.insert(Tag, (
+            Tag(
+                name=f'Тег {number}',
+                color=f'#{self.random.randrange(0x1000000):06X}',
+                slug=f'tag-{number}'
+            )
+            for number in range(existing + 1, self.options['tags'] + 1)
+        ))
+        return list(Tag.objects.values_list('pk', flat=True))
+
+    def create_users(self):
+        prefix = f'fake{int(time.time())}'
+        password = make_password(None)
+        return self.insert(User, (
+            User(
+                username=f'{prefix}_{number}',
+                email=f'{prefix}_{number}@example.com',
+                first_name=self.random.choice(('Анна', 'Иван', 'Мария')),
+                last_name=self.random.choice(('Смирнов', 'Кузнецова')),
+                password=password
+            )
+            for number in range(self.options['users'])
+        ))
+
+    def create_image(self):
+        '''Одна картинка на все рецепты: хранилище по хэшу содержимого
+        не создаст копий, а уменьшенные копии строятся один раз.
+        '''
+
+        buffer = BytesIO()
+        Image.new('RGB', (960, 640), '#d08040').save(buffer, 'JPEG')
+        field = Recipe._meta.get_field('image')
+        name = field.storage.save(
+            f'{field.upload_to}fake.jpg', ContentFile(buffer.getvalue())
+        )
+        image = Recipe(image=name).image
+        return name, build_derivatives(image)
+
+    def fake_recipe(self, author_id, image, derivatives):
+        rng = self.random
+        name = f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}'
+        return Recipe(
+            author_id=author_id,
+            name=name,
+            text=' '.join(rng.choices(WORDS, k=rng.randint(15, 60))),
+            cooking_time=rng.randint(5, 180),
+            image=image,
+            image_derivatives=derivatives
+        )
+
+    def create_recipes(self, user_ids, author_weights):
+        image, derivatives = self.create_image()
+        authors = self.random.choices(
+            user_ids, cum_weights=author_weights, k=self.options['recipes']
+        )
+        recipe_ids = self.insert(Recipe, (
+            self.fake_recipe(author_id, image, derivatives)
+            for author_id in authors
+        ))
+        # auto_now_add ставит всем рецептам одно время, разносим их
+        # по последним двум годам в порядке создания.
+        now = timezone.now()
+        step = RECIPE_SPAN / max(len(recipe_ids), 1)
+        total = len(recipe_ids)
+        for batch in chunked(enumerate(recipe_ids), self.batch_size):
+            Recipe.objects.bulk_update([
+                Recipe(pk=pk, pub_date=now - step * (total - position))
+                for position, pk in batch
+            ], ['pub_date'])
+        return recipe_ids
+
+    def create_links(self, recipe_ids, tag_ids):
+        rng = self.random
+        self.insert(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tag_ids, min(len(tag_ids),
+                                                  rng.randint(1, 3)))
+        ))
+        self.insert(IngredientRecipe, (
+            IngredientRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500)
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(self.ingredient_ids, min(
+                len(self.ingredient_ids), rng.randint(3, 12)
+            ))
+        ))
+
+    def create_relations(self, model, field, user_ids, target_ids, weights,
+                         average):
+        '''Связи польз-ль -> объект: число связей у польз-ля распределено
+        логнормально, выбор объекта - по Ципфу, поэтому немногие
+        популярные рецепты и авторы собирают большую часть связей.
+        '''
+
+        if not average or not target_ids:
+            return
+        rng = self.random
+        mu = math.log(average) - 0.5
+
+        def relations():
+            for user_id in user_ids:
+                size = min(int(rng.lognormvariate(mu, 1.0)), len(target_ids))
+                targets = set(rng.choices(
+                    target_ids, cum_weights=weights, k=size
+                ))
+                targets.discard(user_id if field == 'author_id' else None)
+                for target_id in targets:
+                    yield model(user_id=user_id, **{field: target_id})
+
+        self.insert(model, relations())
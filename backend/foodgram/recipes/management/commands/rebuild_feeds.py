@@ -0,0 +1,29 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.feeds import rebuild, trim_overfull
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит ленты подписчиков, например после загрузки '
+        'данных в обход сигналов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trim', action='store_true',
+            help='Только обрезать ленты до FEED_MAX_ENTRIES записей: '
+                 'новые рецепты их не обрезают, запускать периодически'
+        )
+
+    def handle(self, *args, **options):
+        if options['trim']:
+            trimmed = trim_overfull(apps.get_model('recipes', 'FeedEntry'))
+            self.stdout.write(self.style.SUCCESS(
+                f'Обрезано лент: {trimmed}.'
+            ))
+            return
+        with transaction.atomic():
+            total = rebuild(apps.get_model)
+        self.stdout.write(self.style.SUCCESS(f'Записей в лентах: {total}.'))
@@ -0,0 +1,20 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики избранного, списков покупок, '
+        'рецептов и подписчиков, если они разошлись с данными'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = recount(apps.get_model)
+        for counter, total in fixed.items():
+            self.stdout.write(f'{counter}: исправлено {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков: {sum(fixed.values())}.'
+        ))
@@ -0,0 +1,54 @@
+# Generated by Django 3.1.2 on 2026-10-18 19:21
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Копия recipes.counters.COUNTERS на момент миграции: код приложения
+# может измениться, а миграция должна работать как прежде.
+COUNTERS = (
+    ('recipes.Recipe', 'favorites_count', 'recipes.Favorite', 'recipe'),
+    ('recipes.Recipe', 'in_carts_count', 'recipes.ShoppingCart', 'recipe'),
+    ('users.CustomUser', 'recipes_count', 'recipes.Recipe', 'author'),
+    ('users.CustomUser', 'followers_count', 'recipes.Subscription', 'author'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    '''Заполняет счетчики по уже существующим записям.'''
+
+    for label, field, related_label, related_field in COUNTERS:
+        related_model = apps.get_model(related_label)
+        apps.get_model(label).objects.update(**{field: Coalesce(
+            Subquery(
+                related_model.objects
+                .filter(**{related_field: OuterRef('pk')})
+                .order_by()
+                .values(related_field)
+                .annotate(total=Count('pk'))
+                .values('total')
+            ),
+            0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_image_content_hash_storage'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
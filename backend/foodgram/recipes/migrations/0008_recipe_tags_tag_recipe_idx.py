@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    '''Индекс (tag_id, recipe_id) для фильтра рецептов по тегам.
+
+    Автоматическая промежуточная таблица M2M не поддерживает Meta.indexes,
+    поэтому индекс создается SQL. Для Favorite и ShoppingCart индекс
+    (user_id, recipe_id) уже создан их уникальными ограничениями.
+    '''
+
+    dependencies = [
+        ('recipes', '0007_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX recipes_recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id);',
+            'DROP INDEX recipes_recipe_tags_tag_recipe_idx;',
+        ),
+    ]
@@ -0,0 +1,52 @@
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# Повторяет recipes.search, а не импортирует его, чтобы миграция
+# не менялась вместе с кодом приложения.
+SEARCH_CONFIG = 'russian'
+
+
+def uses_search_vector(connection):
+    return connection.vendor == 'postgresql'
+
+
+def create_search_index(apps, schema_editor):
+    '''GIN-индекс и заполнение вектора только для PostgreSQL,
+    в остальных БД поиск идет по индексу в памяти процесса.
+    '''
+
+    if not uses_search_vector(schema_editor.connection):
+        return
+    schema_editor.execute(
+        'CREATE INDEX recipe_search_vector_idx '
+        'ON recipes_recipe USING GIN (search_vector);'
+    )
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.using(schema_editor.connection.alias).update(
+        search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+        )
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if uses_search_vector(schema_editor.connection):
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx;')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_tags_tag_recipe_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
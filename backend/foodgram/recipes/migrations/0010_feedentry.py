@@ -0,0 +1,90 @@
+# Generated by Django 3.1.2 on 2026-10-18 19:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Q
+
+# Значения FEED_* на момент создания миграции: ее результат не должен
+# зависеть от настроек, с которыми она применяется.
+FEED_FANOUT_LIMIT = 10000
+FEED_BACKFILL = 100
+FEED_MAX_ENTRIES = 1000
+BATCH_SIZE = 2000
+
+
+def build_feeds(apps, schema_editor):
+    '''Строит ленты по уже существующим подпискам.
+
+    Логика recipes.feeds.rebuild повторена здесь, чтобы миграция не
+    зависела от кода приложения.
+    '''
+
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('recipes', 'Subscription')
+
+    authors = Subscription.objects.filter(
+        author__followers_count__lt=FEED_FANOUT_LIMIT
+    ).values_list('author_id', flat=True).distinct().order_by()
+    for author_id in list(authors):
+        recipe_ids = list(
+            Recipe.objects.filter(author_id=author_id)
+            .order_by('-pub_date', '-id')
+            .values_list('pk', flat=True)[:FEED_BACKFILL]
+        )
+        followers = Subscription.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True)
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(user_id=user_id, recipe_id=recipe_id)
+                for user_id in followers
+                for recipe_id in recipe_ids
+            ),
+            batch_size=BATCH_SIZE
+        )
+
+    limit = FEED_MAX_ENTRIES
+    users = FeedEntry.objects.values_list('user_id', flat=True).distinct()
+    for user_id in list(users.order_by()):
+        cutoff = list(
+            FeedEntry.objects.filter(user_id=user_id)
+            .order_by('-recipe__pub_date', '-recipe_id')
+            .values_list('recipe__pub_date', 'recipe_id')[limit:limit + 1]
+        )
+        if cutoff:
+            pub_date, recipe_id = cutoff[0]
+            FeedEntry.objects.filter(user_id=user_id).filter(
+                Q(recipe__pub_date__lt=pub_date)
+                | Q(recipe__pub_date=pub_date, recipe_id__lte=recipe_id)
+            ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0009_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+                'ordering': ['pk'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(build_feeds, migrations.RunPython.noop),
+    ]
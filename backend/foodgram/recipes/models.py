@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from recipes.storage import ContentHashStorage
 
 User = get_user_model()
 
@@ -47,6 +49,12 @@ class Ingredient(models.Model):
         ordering = [('pk')]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -67,7 +75,14 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         'Картинка рецепта',
-        upload_to='recipes_cover/'
+        upload_to='recipes_cover/',
+        storage=ContentHashStorage()
+    )
+    image_derivatives = models.JSONField(
+        'Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False
     )
     text = models.TextField('Описание рецепта')
     ingredients = models.ManyToManyField(
@@ -87,11 +102,31 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
 
     class Meta:
-        ordering = [('-pub_date')]
+        ordering = ['-pub_date', '-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -215,3 +250,36 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} {self.recipe}'
+
+
+class FeedEntry(models.Model):
+    '''Рецепт в ленте подписчика.
+
+    Заполняется при создании рецепта и подписке, см. recipes.feeds.
+    '''
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        ordering = [('pk')]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_entry'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.recipe}'
@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from recipes.models import Favorite, ShoppingCart, Subscription
+from recipes.versions import bump_version, get_version, user_version_name
+
+FAVORITES = 'favorites'
+SHOPPING_CART = 'shopping_cart'
+FOLLOWING = 'following'
+RELATIONS = 'relations'
+RELATIONS_TIMEOUT = 24 * 60 * 60
+LOCK_TIMEOUT = 5
+
+SOURCES = {
+    FAVORITES: (Favorite, 'recipe_id'),
+    SHOPPING_CART: (ShoppingCart, 'recipe_id'),
+    FOLLOWING: (Subscription, 'author_id'),
+}
+EMPTY = {kind: frozenset() for kind in SOURCES}
+
+
+def relations_key(user_id):
+    '''Ключ связей польз-ля. Версия меняется, когда закэшированный набор
+    нельзя безопасно поправить на месте.
+    '''
+
+    version = get_version(user_version_name(RELATIONS, user_id))
+    return f'{RELATIONS}:{user_id}:{version}'
+
+
+def load_relations(user_id):
+    '''id рецептов в избранном и в списке покупок польз-ля и id авторов,
+    на которых он подписан: {'favorites': {...}, ...}.
+    '''
+
+    key = relations_key(user_id)
+    relations = cache.get(key)
+    if relations is None:
+        relations = {
+            kind: set(
+                model.objects
+                .filter(user_id=user_id)
+                .values_list(field, flat=True)
+            )
+            for kind, (model, field) in SOURCES.items()
+        }
+        # add, а не set: набор, поправленный update_relations, пока
+        # читалась БД, не затирается прочитанным до изменения.
+        cache.add(key, relations, RELATIONS_TIMEOUT)
+    return relations
+
+
+def get_relations(request):
+    '''Связи текущего польз-ля, загружаются один раз за запрос.'''
+
+    if request.user.is_anonymous:
+        return EMPTY
+    if not hasattr(request, '_relations'):
+        request._relations = load_relations(request.user.pk)
+    return request._relations
+
+
+def update_relations(user_id, kind, object_id, added):
+    '''Вносит изменение в закэшированные связи польз-ля.
+
+    Изменения одного польз-ля правят набор по очереди под блокировкой
+    в общем кэше. Если блокировку занял другой процесс или набора в
+    кэше нет, меняется версия ключа: набор перечитается из БД.
+    '''
+
+    version_name = user_version_name(RELATIONS, user_id)
+    lock = f'{RELATIONS}:{user_id}:lock'
+    if not cache.add(lock, True, LOCK_TIMEOUT):
+        bump_version(version_name)
+        return
+    try:
+        key = relations_key(user_id)
+        relations = cache.get(key)
+        if relations is None:
+            bump_version(version_name)
+            return
+        if added:
+            relations[kind].add(object_id)
+        else:
+            relations[kind].discard(object_id)
+        cache.set(key, relations, RELATIONS_TIMEOUT)
+    finally:
+        cache.delete(lock)
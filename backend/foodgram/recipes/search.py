@@ -0,0 +1,18 @@
+from django.contrib.postgres.search import SearchVector
+
+SEARCH_CONFIG = 'russian'
+
+
+def uses_search_vector(connection):
+    '''Полнотекстовый поиск по tsvector есть только в PostgreSQL.'''
+
+    return connection.vendor == 'postgresql'
+
+
+def search_vector():
+    '''Выражение для Recipe.search_vector: название важнее описания.'''
+
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+    )
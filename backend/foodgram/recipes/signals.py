@@ -0,0 +1,151 @@
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipes import feeds
+from recipes.counters import COUNTERS, change_counter
+from recipes.images import build_derivatives, needs_derivatives
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Subscription, Tag)
+from recipes.relations import SOURCES, update_relations
+from recipes.search import search_vector, uses_search_vector
+from recipes.versions import (INGREDIENTS, RECIPES, SHOPPING_CART, TAGS,
+                              bump_version, user_version_name)
+
+COUNTED_BY = {
+    apps.get_model(related_label): (apps.get_model(label), field, related)
+    for label, field, related_label, related in COUNTERS
+}
+
+
+def bump_on_commit(name):
+    '''Меняет версию после фиксации транзакции, чтобы закэшированные
+    по новой версии данные не оказались прочитаны до записи.
+    '''
+
+    transaction.on_commit(lambda: bump_version(name))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    bump_on_commit(INGREDIENTS)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(sender, **kwargs):
+    bump_on_commit(TAGS)
+    bump_on_commit(RECIPES)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def recipes_changed(sender, **kwargs):
+    bump_on_commit(RECIPES)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_text_saved(sender, instance, using, update_fields=None, **kwargs):
+    '''Обновляет поисковый вектор рецепта в той же транзакции.'''
+
+    if not uses_search_vector(connections[using]):
+        return
+    if update_fields is not None and not {'name', 'text'} & set(update_fields):
+        return
+    Recipe.objects.using(using).filter(pk=instance.pk).update(
+        search_vector=search_vector()
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump_on_commit(RECIPES)
+
+
+@receiver(post_save, sender=get_user_model())
+def author_changed(sender, update_fields=None, **kwargs):
+    '''Данные автора входят в ответы с рецептами. Обновление одного
+    last_login при входе на них не влияет.
+    '''
+
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_on_commit(RECIPES)
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    bump_on_commit(user_version_name(SHOPPING_CART, instance.user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, raw=False, **kwargs):
+    '''Создает уменьшенные копии новой картинки рецепта.'''
+
+    if raw or not needs_derivatives(instance):
+        return
+    # Одинаковые картинки хранятся в одном файле, поэтому копии
+    # можно взять у другого рецепта с тем же исходником.
+    existing = Recipe.objects.filter(
+        image_derivatives__source=instance.image.name
+    ).values_list('image_derivatives', flat=True).first()
+    instance.image_derivatives = existing or build_derivatives(instance.image)
+    Recipe.objects.filter(pk=instance.pk).update(
+        image_derivatives=instance.image_derivatives
+    )
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Subscription)
+def counted_object_changed(sender, instance, signal, created=False,
+                           raw=False, **kwargs):
+    '''Обновляет счетчик в той же транзакции, что и запись/удаление.
+    Расхождения, например после loaddata, исправляет команда recount.
+    '''
+
+    if raw or not (created or signal is post_delete):
+        return
+    model, field, related = COUNTED_BY[sender]
+    change_counter(
+        model, getattr(instance, f'{related}_id'), field, 1 if created else -1
+    )
+
+
+RELATION_KINDS = {model: kind for kind, (model, _) in SOURCES.items()}
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscription)
+def relation_changed(sender, instance, signal, **kwargs):
+    '''Обновляет закэшированные связи польз-ля после фиксации записи.'''
+
+    kind = RELATION_KINDS[sender]
+    object_id = getattr(instance, SOURCES[kind][1])
+    transaction.on_commit(lambda: update_relations(
+        instance.user_id, kind, object_id, signal is post_save
+    ))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        feeds.fan_out(instance)
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def subscription_changed(sender, instance, signal, created=False, raw=False,
+                         **kwargs):
+    '''Наполняет ленту польз-ля рецептами нового автора или убирает
+    их при отписке. Срабатывает после counted_object_changed, поэтому
+    популярность автора проверяется по уже обновленному счетчику.
+    '''
+
+    if raw:
+        return
+    if created:
+        feeds.backfill(instance.user_id, instance.author_id)
+    elif signal is post_delete:
+        feeds.remove(instance.user_id, instance.author_id)
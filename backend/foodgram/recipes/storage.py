@@ -0,0 +1,38 @@
+import os
+from hashlib import sha256
+from pathlib import PurePosixPath
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentHashStorage(FileSystemStorage):
+    '''Файловое хранилище, в котором имя файла - хэш его содержимого.
+
+    Одинаковые загрузки попадают в один файл: если файл с таким хэшем
+    уже есть, он не перезаписывается, а только получает новое время
+    изменения, чтобы gc_media --min-age не удалил его как старый
+    неиспользуемый файл, пока рецепт с ним сохраняется.
+    '''
+
+    def get_hashed_name(self, name, content):
+        digest = sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        path = PurePosixPath(name)
+        hexdigest = digest.hexdigest()
+        return str(
+            path.parent / hexdigest[:2] / f'{hexdigest}{path.suffix.lower()}'
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = self.get_hashed_name(name, content)
+        if self.exists(name):
+            try:
+                os.utime(self.path(name))
+            except FileNotFoundError:
+                pass
+            else:
+                return name
+        return super().save(name, content, max_length)
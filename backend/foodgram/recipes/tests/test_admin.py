@@ -0,0 +1,83 @@
+from api.tests.base import FoodgramTestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from recipes.models import Favorite, Ingredient, ShoppingCart, Subscription
+
+User = get_user_model()
+
+CHANGELISTS = (
+    'recipes_recipe', 'recipes_ingredient', 'recipes_tag',
+    'recipes_favorite', 'recipes_shoppingcart', 'recipes_subscription',
+    'users_customuser',
+)
+
+
+class AdminQueriesTest(FoodgramTestCase):
+    '''Число запросов страниц админки не растет с размером таблиц.'''
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='pass'
+        )
+        self.client.force_login(self.admin)
+
+    def grow_tables(self):
+        users = [
+            User.objects.create(
+                email=f'extra{number}@example.com', username=f'extra{number}'
+            )
+            for number in range(50)
+        ]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Лишний {number}', measurement_unit='кг')
+            for number in range(200)
+        )
+        for user in users:
+            Favorite.objects.create(user=user, recipe=self.recipes[0])
+            ShoppingCart.objects.create(user=user, recipe=self.recipes[1])
+            Subscription.objects.create(user=user, author=self.authors[1])
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries), response.content.count(b'<option')
+
+    def test_changelists_do_not_depend_on_table_size(self):
+        urls = [
+            reverse(f'admin:{name}_changelist') for name in CHANGELISTS
+        ]
+        before = [self.count_queries(url) for url in urls]
+        self.grow_tables()
+        after = [self.count_queries(url) for url in urls]
+        for url, (queries, options), (grown_queries, grown_options) in zip(
+            urls, before, after
+        ):
+            with self.subTest(url=url):
+                self.assertLessEqual(queries, 6)
+                self.assertEqual(grown_queries, queries)
+                self.assertEqual(grown_options, options)
+
+    def test_recipe_change_page_does_not_list_all_ingredients(self):
+        url = reverse(
+            'admin:recipes_recipe_change', args=[self.recipes[0].pk]
+        )
+        # Первый запрос заполняет кэш ContentType.
+        self.client.get(url)
+        queries, options = self.count_queries(url)
+        self.grow_tables()
+        grown_queries, grown_options = self.count_queries(url)
+        self.assertEqual(grown_queries, queries)
+        self.assertEqual(grown_options, options)
+        self.assertLess(options, len(self.tags) + 10)
+
+    def test_recipe_search_by_tag_name(self):
+        response = self.client.get(
+            reverse('admin:recipes_recipe_changelist'), {'q': 'Тег'}
+        )
+        self.assertEqual(
+            response.context['cl'].result_count, len(self.recipes)
+        )
@@ -0,0 +1,69 @@
+from io import StringIO
+
+from api.tests.base import FoodgramTestCase
+from django.core.management import call_command
+from django.test import override_settings
+from recipes.models import FeedEntry, Recipe, Subscription
+
+
+@override_settings(FEED_FANOUT_LIMIT=2)
+class FeedFanoutLimitTest(FoodgramTestCase):
+    '''Ленты подписчиков автора, который стал популярным и перестал им
+    быть.
+    '''
+
+    def feed(self, user):
+        return set(
+            FeedEntry.objects.filter(user=user)
+            .values_list('recipe_id', flat=True)
+        )
+
+    def test_unpopular_author_is_backfilled_for_remaining_followers(self):
+        author, follower = self.authors[1], self.authors[2]
+        Subscription.objects.create(user=self.user, author=author)
+        Subscription.objects.create(user=follower, author=author)
+        self.assertEqual(self.feed(follower), set())
+
+        recipe = Recipe.objects.create(
+            author=author, name='Новый', text='Описание', cooking_time=5,
+            image=self.recipes[0].image.name
+        )
+        self.assertNotIn(recipe.pk, self.feed(self.user))
+
+        Subscription.objects.get(user=self.user, author=author).delete()
+        self.assertEqual(
+            self.feed(follower),
+            set(author.recipes.values_list('pk', flat=True))
+        )
+        self.assertFalse(
+            FeedEntry.objects.filter(
+                user=self.user, recipe__author=author
+            ).exists()
+        )
+
+
+@override_settings(FEED_MAX_ENTRIES=2)
+class FeedTrimTest(FoodgramTestCase):
+
+    def test_trim_keeps_latest_entries(self):
+        follower = self.authors[1]
+        Subscription.objects.create(user=follower, author=self.authors[0])
+        Recipe.objects.create(
+            author=self.authors[0], name='Новый', text='Описание',
+            cooking_time=5, image=self.recipes[0].image.name
+        )
+        self.assertEqual(FeedEntry.objects.filter(user=follower).count(), 3)
+
+        call_command('rebuild_feeds', '--trim', stdout=StringIO())
+        latest = list(
+            self.authors[0].recipes.order_by('-pub_date', '-id')
+            .values_list('pk', flat=True)[:2]
+        )
+        for user in (self.user, follower):
+            self.assertEqual(
+                set(
+                    FeedEntry.objects.filter(user=user)
+                    .values_list('recipe_id', flat=True)
+                ),
+                set(latest)
+            )
@@ -0,0 +1,30 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+from recipes.storage import ContentHashStorage
+
+
+class ContentHashStorageTests(SimpleTestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        self.storage = ContentHashStorage(location=self.location)
+
+    def test_duplicate_upload_reuses_file_and_refreshes_mtime(self):
+        name = self.storage.save('covers/a.png', ContentFile(b'image'))
+        old = time.time() - 7200
+        os.utime(self.storage.path(name), (old, old))
+
+        duplicate = self.storage.save('covers/b.PNG', ContentFile(b'image'))
+
+        self.assertEqual(duplicate, name)
+        self.assertGreater(
+            os.path.getmtime(self.storage.path(name)), time.time() - 60
+        )
+        directories, _ = self.storage.listdir('covers')
+        self.assertEqual(directories, [name.split('/')[1]])
@@ -0,0 +1,19 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from recipes.versions import LOCAL_CACHE, check_shared_cache
+
+
+class CheckSharedCacheTest(SimpleTestCase):
+
+    @override_settings(CACHES={'default': {'BACKEND': LOCAL_CACHE}})
+    def test_local_cache_allows_one_process(self):
+        check_shared_cache(1)
+        with self.assertRaises(ImproperlyConfigured):
+            check_shared_cache(2)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'foodgram_cache',
+    }})
+    def test_shared_cache_allows_many_processes(self):
+        check_shared_cache(4)
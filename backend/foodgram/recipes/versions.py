@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+INGREDIENTS = 'ingredients'
+TAGS = 'tags'
+RECIPES = 'recipes'
+SHOPPING_CART = 'shopping_cart'
+
+LOCAL_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def get_version(name):
+    '''Версия набора данных name, меняется при каждом его изменении.'''
+
+    key = f'version:{name}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        return cache.get(key, time.time_ns())
+    return version
+
+
+def bump_version(name):
+    '''Помечает набор данных name как измененный.'''
+
+    cache.set(f'version:{name}', time.time_ns(), None)
+
+
+def user_version_name(name, user_id):
+    '''Имя версии набора данных name конкретного польз-ля.'''
+
+    return f'{name}:{user_id}'
+
+
+def is_shared_cache():
+    '''Кэш default виден всем процессам, а не только текущему.'''
+
+    return settings.CACHES['default']['BACKEND'] != LOCAL_CACHE
+
+
+def check_shared_cache(processes):
+    '''Версии живут в кэше default, и их изменение должны видеть все
+    процессы. LocMemCache у каждого процесса свой, поэтому с ним
+    можно запускать только один.
+    '''
+
+    backend = settings.CACHES['default']['BACKEND']
+    if processes > 1 and not is_shared_cache():
+        raise ImproperlyConfigured(
+            f'{backend} виден только одному процессу, а запускается '
+            f'{processes}: задайте CACHE_BACKEND с общим кэшем.'
+        )
@@ -13,10 +13,12 @@ class CustomUserdmin(admin.ModelAdmin):
         'username',
         'first_name',
         'last_name',
+        'recipes_count',
+        'followers_count',
         'password'
     )
     search_fields = ('email', 'username')
-    list_filter = ('email', 'username')
+    list_filter = ('is_staff', 'is_active')
     empty_value_display = '-пусто-'
 
 
@@ -20,6 +20,16 @@ class CustomUser(AbstractUser):
         'Фамилия',
         max_length=150
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = [('pk')]
@@ -28,3 +38,14 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return f'{self.username} - {self.first_name} {self.last_name}'
+
+    def refresh_from_db(self, using=None, fields=None):
+        '''Обращение к отложенному полю загружает все отложенные поля
+        одним запросом, а не по запросу на поле.
+        '''
+
+        if fields is not None:
+            deferred_fields = self.get_deferred_fields()
+            if deferred_fields.intersection(fields):
+                fields = deferred_fields.union(fields)
+        super().refresh_from_db(using, fields)